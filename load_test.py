@@ -0,0 +1,400 @@
+r"""
+Нагрузочный тест проектов ya_news и ya_note без развёртывания.
+
+WSGI-приложение проекта (yanews/wsgi.py или yanote/wsgi.py) вызывается
+напрямую из нескольких процессов, каждый из которых выполняет смесь
+сценариев в заданной пропорции. Итог - JSON с RPS, задержками
+p50/p95/p99, числом запросов к БД на HTTP-запрос и долей ошибок,
+в целом и по сценариям, чтобы прогоны можно было сравнивать.
+
+Данные для прогона создаются в базе проекта (она должна быть
+мигрирована) и удаляются по окончании. Лимиты частоты запросов
+(RATE_LIMITS) на время прогона снимаются, если не указан
+--keep-rate-limits: все процессы пишут от одного пользователя.
+
+    python load_test.py ya_news --workers 4 --seconds 10 \
+        --mix home=70,detail=25,comment=5 --output news.json
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import nullcontext
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlencode
+
+BASE_DIR = Path(__file__).resolve().parent
+
+PROJECTS = {
+    'ya_news': {
+        'package': 'yanews',
+        'mix': 'home=70,detail=25,comment=5',
+    },
+    'ya_note': {
+        'package': 'yanote',
+        'mix': 'list=40,detail=40,create=10,edit=5,delete=5',
+    },
+}
+
+
+class Worker:
+    """Клиент одного процесса: cookie, CSRF-токен и счётчик запросов к БД."""
+
+    def __init__(self, number, application, fixture, seed):
+        self.number = number
+        self.application = application
+        self.fixture = fixture
+        self.rng = random.Random(seed + number)
+        self.cookies = {fixture['session_cookie']: fixture['session']}
+        self.slugs = []
+        self.created = 0
+        self.queries = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, method, path, data=None, anonymous=False):
+        """Выполняет запрос к WSGI-приложению и возвращает код ответа."""
+        body = urlencode(data or {}).encode()
+        cookies = {} if anonymous else self.cookies
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_COOKIE': '; '.join(
+                f'{name}={value}' for name, value in cookies.items()
+            ),
+            'HTTP_X_CSRFTOKEN': cookies.get('csrftoken', ''),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.url_scheme': 'http',
+        }
+        result = {}
+
+        def start_response(status, headers, exc_info=None):
+            result['status'] = int(status.split()[0])
+            result['headers'] = headers
+
+        response = self.application(environ, start_response)
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        if not anonymous:
+            self.remember_cookies(result['headers'])
+        return result['status']
+
+    def remember_cookies(self, headers):
+        for name, value in headers:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+
+    def get(self, path, anonymous=False):
+        """GET успешен, если страница отдана."""
+        return self.request(
+            'GET', path, anonymous=anonymous
+        ) == HTTPStatus.OK
+
+    def post(self, path, data):
+        """POST успешен, если форма принята и выполнен редирект."""
+        return self.request('POST', path, data) == HTTPStatus.FOUND
+
+
+def news_home(worker):
+    from django.urls import reverse
+    return worker.get(reverse('news:home'), anonymous=True)
+
+
+def news_detail(worker):
+    from django.urls import reverse
+    news_id = worker.rng.choice(worker.fixture['news_ids'])
+    return worker.get(reverse('news:detail', args=(news_id,)))
+
+
+def news_comment(worker):
+    from django.urls import reverse
+    news_id = worker.rng.choice(worker.fixture['news_ids'])
+    return worker.post(
+        reverse('news:detail', args=(news_id,)),
+        {'text': f'Комментарий нагрузочного теста {worker.number}'},
+    )
+
+
+def note_list(worker):
+    from django.urls import reverse
+    return worker.get(reverse('notes:list'))
+
+
+def note_detail(worker):
+    from django.urls import reverse
+    slug = worker.rng.choice(worker.fixture['slugs'])
+    return worker.get(reverse('notes:detail', args=(slug,)))
+
+
+def note_form(worker):
+    from django.urls import reverse
+    return worker.get(reverse('notes:add'))
+
+
+def note_create(worker):
+    from django.urls import reverse
+    worker.created += 1
+    slug = f'load-{worker.number}-{worker.created}'
+    created = worker.post(reverse('notes:add'), {
+        'title': f'Заметка {slug}', 'text': 'Текст.', 'slug': slug,
+    })
+    if created:
+        worker.slugs.append(slug)
+    return created
+
+
+def note_edit(worker):
+    from django.urls import reverse
+    if not worker.slugs:
+        return note_create(worker)
+    slug = worker.rng.choice(worker.slugs)
+    return worker.post(reverse('notes:edit', args=(slug,)), {
+        'title': f'Изменённая {slug}', 'text': 'Новый текст.', 'slug': slug,
+    })
+
+
+def note_delete(worker):
+    from django.urls import reverse
+    if not worker.slugs:
+        return note_create(worker)
+    slug = worker.slugs.pop(worker.rng.randrange(len(worker.slugs)))
+    return worker.post(reverse('notes:delete', args=(slug,)), {})
+
+
+SCENARIOS = {
+    'ya_news': {
+        'home': news_home,
+        'detail': news_detail,
+        'comment': news_comment,
+    },
+    'ya_note': {
+        'list': note_list,
+        'detail': note_detail,
+        'create': note_create,
+        'edit': note_edit,
+        'delete': note_delete,
+    },
+}
+# Страницы с формой: их ответ выставляет cookie csrftoken.
+CSRF_PAGES = {'ya_news': news_detail, 'ya_note': note_form}
+
+
+def create_fixture(project, size):
+    """Создаёт пользователя и данные прогона, возвращает их описание."""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    user = get_user_model().objects.create(username='load_test')
+    fixture = {'user_id': user.pk}
+    if project == 'ya_news':
+        from news.models import News
+        fixture['news_ids'] = [
+            News.objects.create(title=f'Новость {index}', text='Текст.').pk
+            for index in range(size)
+        ]
+    else:
+        from notes.models import Note
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}', text='Текст.',
+                slug=f'load-seed-{index}', author=user,
+            )
+            for index in range(size)
+        )
+        fixture['slugs'] = [f'load-seed-{index}' for index in range(size)]
+    client = Client()
+    client.force_login(user)
+    fixture['session_cookie'] = settings.SESSION_COOKIE_NAME
+    fixture['session'] = client.cookies[settings.SESSION_COOKIE_NAME].value
+    return fixture
+
+
+def delete_fixture(project, fixture):
+    """Удаляет данные прогона; заметки и комментарии уходят с автором."""
+    from django.contrib.auth import get_user_model
+    if project == 'ya_news':
+        from news.models import News
+        News.objects.filter(pk__in=fixture['news_ids']).delete()
+    get_user_model().objects.filter(pk=fixture['user_id']).delete()
+
+
+def run_worker(task):
+    """Гоняет сценарии до истечения времени и возвращает сырые замеры."""
+    from django.db import connection
+
+    project, number, fixture, mix, seconds, seed = task
+    application = importlib.import_module(
+        f'{PROJECTS[project]["package"]}.wsgi'
+    ).application
+    worker = Worker(number, application, fixture, seed)
+    CSRF_PAGES[project](worker)
+    names, weights = zip(*mix.items())
+    stats = {
+        name: {'latencies': [], 'errors': 0, 'queries': 0} for name in names
+    }
+    deadline = perf_counter() + seconds
+    with connection.execute_wrapper(worker.count_query):
+        while perf_counter() < deadline:
+            name = worker.rng.choices(names, weights)[0]
+            worker.queries = 0
+            start = perf_counter()
+            try:
+                failed = not SCENARIOS[project][name](worker)
+            except Exception:
+                failed = True
+            stats[name]['latencies'].append(perf_counter() - start)
+            stats[name]['errors'] += failed
+            stats[name]['queries'] += worker.queries
+    return stats
+
+
+def summarize(latencies, errors, queries, seconds):
+    requests = len(latencies)
+    if requests < 2:
+        percentiles = (latencies or [0]) * 99
+    else:
+        percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': requests,
+        'rps': round(requests / seconds, 1),
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+        'queries_per_request': round(queries / requests, 2)
+        if requests else 0,
+        'error_rate': round(errors / requests, 4) if requests else 0,
+    }
+
+
+def merge(results, names, seconds):
+    """Сводит замеры процессов в отчёт по сценариям и в целом."""
+    report = {}
+    total = {'latencies': [], 'errors': 0, 'queries': 0}
+    for name in names:
+        merged = {'latencies': [], 'errors': 0, 'queries': 0}
+        for result in results:
+            for key in merged:
+                merged[key] += result[name][key]
+        for key in total:
+            total[key] += merged[key]
+        report[name] = summarize(
+            merged['latencies'], merged['errors'], merged['queries'], seconds
+        )
+    return summarize(
+        total['latencies'], total['errors'], total['queries'], seconds
+    ), report
+
+
+def parse_mix(value, project):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS[project]:
+            raise argparse.ArgumentTypeError(
+                f'Нет сценария {name!r}, есть: {", ".join(SCENARIOS[project])}'
+            )
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_django(project):
+    sys.path.insert(0, str(BASE_DIR / project))
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', f'{PROJECTS[project]["package"]}.settings'
+    )
+    import django
+    django.setup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('project', choices=PROJECTS)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--mix', help='Например: home=70,detail=30.')
+    parser.add_argument('--size', type=int, default=50, help='Объектов.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для JSON вместо stdout.')
+    parser.add_argument('--keep-rate-limits', action='store_true')
+    options = parser.parse_args()
+    project = options.project
+    try:
+        mix = parse_mix(options.mix or PROJECTS[project]['mix'], project)
+    except (argparse.ArgumentTypeError, ValueError) as error:
+        parser.error(str(error))
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    setup_django(project)
+
+    from django.db import connections
+    from django.test import override_settings
+
+    rate_limits = nullcontext() if options.keep_rate_limits else (
+        override_settings(RATE_LIMITS={})
+    )
+    # Процессы пула наследуют настройки через fork.
+    with rate_limits:
+        fixture = create_fixture(project, options.size)
+        try:
+            connections.close_all()
+            tasks = [
+                (project, number, fixture, mix, options.seconds, options.seed)
+                for number in range(options.workers)
+            ]
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options.workers) as pool:
+                results = pool.map(run_worker, tasks)
+        finally:
+            delete_fixture(project, fixture)
+    total, scenarios = merge(results, mix, options.seconds)
+    report = {
+        'project': project,
+        'started_at': started_at,
+        'revision': git_revision(),
+        'workers': options.workers,
+        'seconds': options.seconds,
+        'mix': mix,
+        'total': total,
+        'scenarios': scenarios,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        Path(options.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,145 @@
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .models import Comment, News
-
-
-class CommentInline(admin.StackedInline):
-    model = Comment
-    extra = 0
+from .moderation import delete_comments, set_status
+from .search import COMMENTS_INDEX, search
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
-    inlines = [
-        CommentInline,
-    ]
+    """
+    Новости без встроенных комментариев.
+
+    Комментарии популярной новости открываются ссылкой в отдельном
+    списке с поиском и постраничным выводом, а не формой на каждый.
+    """
+    list_display = ('title', 'date', 'comment_count', 'pending_count')
+    search_fields = ('title',)
+    readonly_fields = ('comment_count', 'comments_link')
+    list_per_page = 50
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        """
+        Число ожидающих модерации - одним запросом на страницу.
+
+        Аннотация подзапросом попала бы и в COUNT(*) для пагинации,
+        то есть считалась бы для каждой новости в базе.
+        """
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            news_list = list(changelist.result_list)
+            pending = dict(Comment.objects.filter(
+                news__in=[news.pk for news in news_list],
+                status=Comment.Status.PENDING,
+            ).order_by().values('news').annotate(
+                total=Count('pk')
+            ).values_list('news', 'total'))
+            for news in news_list:
+                news.pending_count = pending.get(news.pk, 0)
+        return response
+
+    @admin.display(description='На модерации')
+    def pending_count(self, news):
+        return news.pending_count
+
+    @admin.display(description='Комментарии')
+    def comments_link(self, news):
+        return format_html(
+            '<a href="{}?news__id__exact={}">Открыть список</a>',
+            reverse('admin:news_comment_changelist'), news.pk,
+        )
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    """
+    Комментарии со ссылками на новость и автора вместо выпадающих списков.
+
+    Поиск по тексту идёт через индекс FTS, действия модерации
+    выполняются одним запросом на весь выбор, удаление - пачками.
+    """
+    list_display = ('__str__', 'news', 'author', 'created', 'status')
+    list_filter = ('status',)
+    list_select_related = ('news', 'author')
+    raw_id_fields = ('news', 'author')
+    readonly_fields = ('created', 'status')
+    search_fields = ('text',)
+    # Совпадает с индексом (news, created, id), прочитанным с конца:
+    # список комментариев новости не сортируется во временной таблице.
+    ordering = ('-created', '-id')
+    list_per_page = 100
+    show_full_result_count = False
+    actions = ('approve', 'reject', 'delete_set')
+
+    def get_actions(self, request):
+        """Стандартное удаление загружает каждый объект - убираем его."""
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search(
+            queryset, COMMENTS_INDEX, search_term, column=0, weights='1.0'
+        ), False
+
+    @admin.action(
+        description='Одобрить выбранные комментарии',
+        permissions=('change',),
+    )
+    def approve(self, request, queryset):
+        updated = set_status(queryset, Comment.Status.APPROVED)
+        self.message_user(request, f'Одобрено комментариев: {updated}')
+
+    @admin.action(
+        description='Отклонить выбранные комментарии',
+        permissions=('change',),
+    )
+    def reject(self, request, queryset):
+        updated = set_status(queryset, Comment.Status.REJECTED)
+        self.message_user(request, f'Отклонено комментариев: {updated}')
+
+    @admin.action(
+        description='Удалить выбранные комментарии',
+        permissions=('delete',),
+    )
+    def delete_set(self, request, queryset):
+        """
+        Удаление после подтверждения, как у стандартного действия.
+
+        Страница подтверждения показывает число комментариев, а не
+        каждый из них. Выбор всех результатов передаётся дальше флагом
+        select_across, а не списком всех id.
+        """
+        if request.POST.get('post'):
+            deleted = delete_comments(queryset, request.user)
+            self.message_user(request, f'Удалено комментариев: {deleted}')
+            return None
+        return TemplateResponse(
+            request,
+            'admin/news/comment/delete_set_confirmation.html',
+            {
+                **self.admin_site.each_context(request),
+                'title': 'Удалить комментарии?',
+                'opts': self.model._meta,
+                'media': self.media,
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+                'count': queryset.count(),
+                'select_across': (
+                    request.POST.get('select_across') == '1'
+                ),
+                # Без отмеченных строк админка не вызовет действие даже
+                # с select_across.
+                'selected': request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME
+                ),
+            },
+        )
@@ -5,3 +5,8 @@ class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from yanews import auth, sqlite  # noqa: F401
+
+        from . import signals  # noqa: F401
@@ -0,0 +1,104 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from yanews.replica import primary
+
+from .models import Comment
+from .pagination import clean_cursor, keyset_page
+
+NEWS_LIST_VERSION_KEY = 'news:list:version'
+NEWS_VERSION_KEY = 'news:{news_id}:version'
+COMMENTS_BLOCK_KEY = 'news:{news_id}:comments:{version}:{cursor}'
+
+
+def get_version(key):
+    """
+    Возвращает текущую версию по ключу.
+
+    Если версии в кеше нет (первое обращение или вытеснение),
+    она заводится заново от текущего времени, чтобы не совпасть
+    ни с одной из уже выданных.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Атомарно увеличивает версию по ключу."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+def get_news_version(news_id):
+    return get_version(NEWS_VERSION_KEY.format(news_id=news_id))
+
+
+def get_news_list_version():
+    return get_version(NEWS_LIST_VERSION_KEY)
+
+
+def bump_news_version(news_id):
+    """
+    Отмечает изменение новости или её комментариев.
+
+    Вместе с версией новости меняется и версия списка новостей:
+    на главной выводится число комментариев.
+    """
+    bump_version(NEWS_VERSION_KEY.format(news_id=news_id))
+    bump_version(NEWS_LIST_VERSION_KEY)
+
+
+def get_comments_block(news, cursor=''):
+    """
+    Отрендеренная страница комментариев к новости.
+
+    В блок попадают только одобренные комментарии. Каждая страница
+    рендерится один раз на версию новости; ссылки
+    редактирования и удаления зависят от пользователя, поэтому в кеш
+    не попадают, а для их вывода рядом с HTML хранится author_id.
+    Блок читается из основной БД: реплика может отставать от версии.
+    Возвращает комментарии и курсор следующей страницы.
+    """
+    # Ключ строится из разобранного курсора, а не из строки запроса.
+    cursor = clean_cursor(cursor)
+    key = COMMENTS_BLOCK_KEY.format(
+        news_id=news.pk,
+        version=get_news_version(news.pk),
+        cursor=cursor,
+    )
+    block = cache.get(key)
+    if block is None:
+        with primary():
+            comments, next_cursor = keyset_page(
+                Comment.objects.approved().filter(
+                    news=news
+                ).select_related('author'),
+                cursor,
+                settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+            )
+        template = get_template('news/includes/comment.html')
+        block = {
+            'comments': [
+                {
+                    'pk': comment.pk,
+                    'author_id': comment.author_id,
+                    'html': template.render({'comment': comment}),
+                }
+                for comment in comments
+            ],
+            'next_cursor': next_cursor,
+        }
+        cache.set(key, block, settings.NEWS_COMMENTS_CACHE_TIMEOUT)
+    return [
+        dict(comment, html=mark_safe(comment['html']))
+        for comment in block['comments']
+    ], block['next_cursor']
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from io import BytesIO
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from news.models import Comment, News
+
+SERVERS = ('wsgi', 'asgi')
+PAGE_CACHE_MIDDLEWARE = 'news.page_cache.AnonymousPageCacheMiddleware'
+
+
+def summarize(server, concurrency, elapsed, latencies, errors):
+    latencies.sort()
+    percentiles = statistics.quantiles(latencies, n=100) if len(
+        latencies
+    ) > 1 else latencies * 99
+    return {
+        'server': server,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentiles[49] * 1000,
+        'p99_ms': percentiles[98] * 1000,
+        'errors': errors,
+    }
+
+
+def run_wsgi(urls, concurrency, seconds):
+    """Потоки-клиенты напрямую вызывают WSGI-приложение yanews.wsgi."""
+    from yanews.wsgi import application
+
+    latencies = []
+    errors = []
+    started = perf_counter()
+    deadline = started + seconds
+
+    def start_response(status, headers, exc_info=None):
+        if not status.startswith('200'):
+            errors.append(status)
+
+    def client(number):
+        while perf_counter() < deadline:
+            number += 1
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': urls[number % len(urls)],
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'HTTP_HOST': 'localhost',
+                'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.input': BytesIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            start = perf_counter()
+            response = application(environ, start_response)
+            b''.join(response)
+            response.close()
+            latencies.append(perf_counter() - start)
+
+    threads = [
+        threading.Thread(target=client, args=(number,))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    return summarize('wsgi', concurrency, elapsed, latencies, len(errors))
+
+
+async def run_asgi(urls, concurrency, seconds):
+    """Корутины-клиенты напрямую вызывают ASGI-приложение yanews.asgi."""
+    from yanews.asgi import application
+
+    latencies = []
+    errors = []
+    started = perf_counter()
+    deadline = started + seconds
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start' and (
+            message['status'] != 200
+        ):
+            errors.append(message['status'])
+
+    async def client(number):
+        while perf_counter() < deadline:
+            number += 1
+            path = urls[number % len(urls)]
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'root_path': '',
+                'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+            start = perf_counter()
+            await application(scope, receive, send)
+            latencies.append(perf_counter() - start)
+
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    elapsed = perf_counter() - started
+    return summarize('asgi', concurrency, elapsed, latencies, len(errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки главной страницы '
+        'и страницы новости под WSGI (синхронные представления) и ASGI '
+        '(NEWS_ASYNC_VIEWS=1) при разном числе одновременных клиентов. '
+        'Каждый замер выполняется в отдельном процессе, кеш страниц '
+        'для анонимов выключен, чтобы запросы доходили до представлений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[10, 100, 1000]
+        )
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--server', choices=SERVERS, help='Служебный.')
+        parser.add_argument('--news-id', type=int, help='Служебный.')
+
+    def handle(self, *args, **options):
+        if options['server']:
+            return self.measure(options)
+        author = get_user_model().objects.create(username='bench_asgi')
+        news = News.objects.create(title='Бенчмарк', text='Текст.')
+        Comment.objects.bulk_create(
+            Comment(
+                news=news, author=author, text=f'Комментарий {index}',
+                status=Comment.Status.APPROVED,
+            )
+            for index in range(20)
+        )
+        try:
+            for concurrency in options['concurrency']:
+                for server in SERVERS:
+                    self.report(self.spawn(
+                        server, concurrency, options['seconds'], news.pk
+                    ))
+        finally:
+            news.delete()
+            author.delete()
+
+    def measure(self, options):
+        urls = [
+            reverse('news:home'),
+            reverse('news:detail', args=(options['news_id'],)),
+        ]
+        # Приложение собирает цепочку middleware при создании.
+        with override_settings(MIDDLEWARE=[
+            name for name in settings.MIDDLEWARE
+            if name != PAGE_CACHE_MIDDLEWARE
+        ]):
+            if options['server'] == 'wsgi':
+                result = run_wsgi(
+                    urls, options['concurrency'][0], options['seconds']
+                )
+            else:
+                result = asyncio.run(run_asgi(
+                    urls, options['concurrency'][0], options['seconds']
+                ))
+        self.stdout.write(json.dumps(result))
+
+    @staticmethod
+    def spawn(server, concurrency, seconds, news_id):
+        env = dict(
+            os.environ, NEWS_ASYNC_VIEWS='1' if server == 'asgi' else '0'
+        )
+        output = subprocess.run(
+            [
+                sys.executable, sys.argv[0], 'bench_asgi',
+                '--server', server,
+                '--concurrency', str(concurrency),
+                '--seconds', str(seconds),
+                '--news-id', str(news_id),
+            ],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def report(self, result):
+        self.stdout.write(
+            '{server} x{concurrency:<5} {rps:8.1f} запросов/с, '
+            'p50 {p50_ms:8.1f} мс, p99 {p99_ms:8.1f} мс, '
+            'ошибок {errors}'.format(**result)
+        )
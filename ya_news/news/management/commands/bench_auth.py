@@ -0,0 +1,64 @@
+import statistics
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from news.models import Comment, News
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает число запросов к БД и время страниц авторизованного '
+        'пользователя в профилях сессий из SESSION_PROFILES. '
+        'Все созданные данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            urls = self.create_data()
+            for profile, profile_settings in settings.SESSION_PROFILES.items():
+                with override_settings(**profile_settings):
+                    client = Client(HTTP_HOST='localhost')
+                    client.force_login(self.user)
+                    for url in urls:
+                        queries, latency = self.measure(
+                            client, url, options['requests']
+                        )
+                        self.stdout.write(
+                            f'{profile:<15} {url:<20} '
+                            f'запросов: {queries}, p50 {latency:.2f} мс'
+                        )
+            transaction.set_rollback(True)
+
+    def create_data(self):
+        self.user = get_user_model().objects.create(username='bench_auth')
+        news = News.objects.create(title='Бенчмарк', text='Текст.')
+        Comment.objects.create(
+            news=news, author=self.user, text='Текст.',
+            status=Comment.Status.APPROVED,
+        )
+        return [reverse('news:home'), reverse('news:detail', args=(news.pk,))]
+
+    @staticmethod
+    def measure(client, url, requests_count):
+        """Число запросов и медиана времени ответа после прогрева."""
+        client.get(url)
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        queries_count = len(queries)
+        timings = []
+        for _ in range(requests_count):
+            start = perf_counter()
+            client.get(url)
+            timings.append((perf_counter() - start) * 1000)
+        return queries_count, statistics.median(timings)
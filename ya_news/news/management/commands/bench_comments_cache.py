@@ -0,0 +1,95 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from news.models import Comment, News
+
+PAGE_CACHE_MIDDLEWARE = 'news.page_cache.AnonymousPageCacheMiddleware'
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+LOCAL_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench-comments-cache',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запросы в секунду к страницам комментариев новости с '
+        'большим числом комментариев без кеша и с кешем блока '
+        'комментариев. Запросы обходят все страницы списка, кеш страниц '
+        'для анонимов выключен. Все созданные данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        middleware = [
+            name for name in settings.MIDDLEWARE
+            if name != PAGE_CACHE_MIDDLEWARE
+        ]
+        with transaction.atomic():
+            news_id = self.create_story(options['comments'])
+            for label, caches in (
+                ('без кеша', NO_CACHE),
+                ('с кешем', LOCAL_CACHE),
+            ):
+                with override_settings(
+                    CACHES=caches, MIDDLEWARE=middleware
+                ):
+                    # Клиент собирает цепочку middleware при первом
+                    # запросе, поэтому создаётся под настройками замера.
+                    client = Client(HTTP_HOST='localhost')
+                    urls = self.page_urls(client, news_id)
+                    rps = self.measure(client, urls, options['requests'])
+                self.stdout.write(
+                    f'{label}: {rps:.1f} запросов/с, страниц {len(urls)}'
+                )
+            transaction.set_rollback(True)
+
+    def create_story(self, comments_count):
+        author = get_user_model().objects.create(
+            username='bench_comments_cache'
+        )
+        news = News.objects.create(title='Бенчмарк', text='Текст.')
+        Comment.objects.bulk_create(
+            Comment(
+                news=news, author=author, text=f'Комментарий {index}',
+                status=Comment.Status.APPROVED,
+            )
+            for index in range(comments_count)
+        )
+        return news.pk
+
+    @staticmethod
+    def page_urls(client, news_id):
+        """Адреса всех страниц комментариев по курсорам из API."""
+        url = reverse('news:detail', args=(news_id,))
+        api_url = reverse('news:api_detail', args=(news_id,))
+        urls = [url]
+        cursor = client.get(api_url).json()['next_cursor']
+        while cursor:
+            urls.append(f'{url}?after={cursor}')
+            cursor = client.get(
+                api_url, {'after': cursor}
+            ).json()['next_cursor']
+        return urls
+
+    @staticmethod
+    def measure(client, urls, requests_count):
+        for url in urls:
+            client.get(url)
+        start = perf_counter()
+        for number in range(requests_count):
+            client.get(urls[number % len(urls)])
+        return requests_count / (perf_counter() - start)
@@ -0,0 +1,107 @@
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from http import HTTPStatus
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает страницу новости параллельными GET и POST комментариев '
+        'и считает пропускную способность и ошибки «database is locked». '
+        'Читатели тоже входят в систему, чтобы их запросы доходили до БД, '
+        'а не до кеша страниц для анонимов. '
+        'Профиль БД задаётся переменной окружения DATABASE_PROFILE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument(
+            '--keep-rate-limits', action='store_true',
+            help='Не снимать RATE_LIMITS: все писатели - один пользователь.'
+        )
+
+    def handle(self, *args, **options):
+        rate_limits = nullcontext() if options['keep_rate_limits'] else (
+            override_settings(RATE_LIMITS={})
+        )
+        with rate_limits:
+            self.run(options)
+
+    def run(self, options):
+        author = get_user_model().objects.create(
+            username='bench_contention'
+        )
+        reader = get_user_model().objects.create(
+            username='bench_contention_reader'
+        )
+        news = News.objects.create(title='Бенчмарк', text='Текст.')
+        url = reverse('news:detail', args=(news.pk,))
+        results = Counter()
+        lock = threading.Lock()
+        deadline = perf_counter() + options['seconds']
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(
+                    url, author if write else reader, write, deadline,
+                    results, lock,
+                )
+            )
+            for write in (
+                [False] * options['readers'] + [True] * options['writers']
+            )
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            news.delete()
+            author.delete()
+            reader.delete()
+        seconds = options['seconds']
+        self.stdout.write(
+            f'Профиль {settings.DATABASE_PROFILE}: '
+            f'чтений {results["read"] / seconds:.1f}/с, '
+            f'комментариев {results["write"] / seconds:.1f}/с, '
+            f'ошибок блокировки {results["locked"]}, '
+            f'отказов по лимиту {results["limited"]}, '
+            f'прочих ошибок {results["error"]}'
+        )
+
+    @staticmethod
+    def worker(url, user, write, deadline, results, lock):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        local = Counter()
+        while perf_counter() < deadline:
+            try:
+                if not write:
+                    response = client.get(url)
+                    kind = 'read'
+                else:
+                    response = client.post(url, {'text': 'Нагрузка'})
+                    kind = 'write'
+                if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                    kind = 'limited'
+                elif response.status_code >= 400:
+                    kind = 'error'
+                local[kind] += 1
+            except OperationalError as error:
+                local['locked' if 'locked' in str(error) else 'error'] += 1
+        connection.close()
+        with lock:
+            results.update(local)
@@ -0,0 +1,58 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from news.profanity import Automaton
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыьэюя'
+TEXT = (
+    'Отличная новость, спасибо автору! Читаю каждый день и жду '
+    'продолжения, особенно про студентов и их приложения. '
+) * 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время проверки комментария на словарях разного размера '
+        'для автомата и для прежнего линейного поиска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 1000, 10000, 100000]
+        )
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        self.stdout.write(f'Длина текста: {len(TEXT)} символов')
+        for size in options['sizes']:
+            words = [
+                ''.join(rng.choices(ALPHABET, k=rng.randint(8, 12)))
+                for _ in range(size)
+            ]
+            start = perf_counter()
+            automaton = Automaton(words)
+            build = perf_counter() - start
+            automaton_time = self.measure(
+                lambda: automaton.search(TEXT), repeat
+            )
+            lowered = TEXT.lower()
+            linear_time = self.measure(
+                lambda: any(word in lowered for word in words), repeat
+            )
+            self.stdout.write(
+                f'{size:>7} слов: автомат {automaton_time:8.1f} мкс, '
+                f'линейный поиск {linear_time:10.1f} мкс, '
+                f'сборка автомата {build * 1000:.0f} мс'
+            )
+
+    @staticmethod
+    def measure(check, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            check()
+        return (perf_counter() - start) / repeat * 1_000_000
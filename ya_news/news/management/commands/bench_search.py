@@ -0,0 +1,88 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from news.search import build_match
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыьэюя'
+NEEDLE = 'гроза'
+NEEDLE_ROWS = 20
+WORDS_PER_ROW = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время поиска по индексу FTS5 и через LIKE на таблицах '
+        'разного размера. Данные создаются в отдельном временном файле '
+        'SQLite, рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+            help='Число строк; для 10M укажите 10000000.'
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--like-limit', type=int, default=1000000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [
+            ''.join(rng.choices(ALPHABET, k=rng.randint(4, 9)))
+            for _ in range(20000)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(Path(directory) / 'bench.sqlite3')
+            db.execute(
+                "CREATE VIRTUAL TABLE docs USING fts5(title, text, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            rows = 0
+            for size in sorted(options['sizes']):
+                self.fill(db, rng, vocabulary, rows, size)
+                rows = size
+                fts = self.measure(db, options['repeat'], (
+                    'SELECT rowid, snippet(docs, 1, char(2), char(3), '
+                    "'…', 16) FROM docs WHERE docs MATCH ? "
+                    'ORDER BY bm25(docs, 10.0, 1.0) LIMIT 20',
+                    (build_match(NEEDLE[:-1]),)
+                ))
+                report = f'{size:>9} строк: FTS5 {fts:8.2f} мс'
+                if size <= options['like_limit']:
+                    like = self.measure(db, 3, (
+                        'SELECT rowid FROM docs WHERE text LIKE ?',
+                        (f'%{NEEDLE[:-1]}%',)
+                    ))
+                    report += f', LIKE {like:8.2f} мс'
+                self.stdout.write(report)
+            db.close()
+
+    @staticmethod
+    def fill(db, rng, vocabulary, start, stop):
+        """Добавляет строки до stop, в первых NEEDLE_ROWS есть искомое."""
+        batch = []
+        for rowid in range(start + 1, stop + 1):
+            words = rng.choices(vocabulary, k=WORDS_PER_ROW)
+            if rowid <= NEEDLE_ROWS:
+                words[rng.randrange(WORDS_PER_ROW)] = NEEDLE
+            batch.append((' '.join(words[:3]), ' '.join(words)))
+            if len(batch) == 10000:
+                db.executemany('INSERT INTO docs VALUES (?, ?)', batch)
+                batch = []
+        db.executemany('INSERT INTO docs VALUES (?, ?)', batch)
+        db.commit()
+
+    @staticmethod
+    def measure(db, repeat, query):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            db.execute(*query).fetchall()
+            timings.append((perf_counter() - start) * 1000)
+        return statistics.median(timings)
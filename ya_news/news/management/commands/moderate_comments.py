@@ -0,0 +1,52 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+
+from news.models import Comment
+from news.moderation import moderate
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер модерации: пачками разбирает комментарии в статусе '
+        'pending. Без --once работает, пока его не остановят, и ждёт '
+        'новых комментариев, когда очередь пуста.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.COMMENT_MODERATION_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.COMMENT_MODERATION_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        total = dict.fromkeys(Comment.Status.values, 0)
+        while True:
+            try:
+                decisions = moderate(options['batch_size'])
+            except OperationalError as error:
+                # Пачку перехватила запись пользователя - повторим.
+                self.stderr.write(f'Пачка не записана: {error}')
+                decisions = None
+            if decisions:
+                for status, count in decisions.items():
+                    total[status] += count
+                continue
+            if options['once'] and decisions is not None:
+                break
+            sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Одобрено: {total[Comment.Status.APPROVED]}, '
+            f'отклонено: {total[Comment.Status.REJECTED]}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from news.search import COMMENTS_INDEX, NEWS_INDEX, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовые индексы новостей и комментариев.'
+
+    def handle(self, *args, **options):
+        for index in (NEWS_INDEX, COMMENTS_INDEX):
+            self.stdout.write(self.style.SUCCESS(
+                f'{index}: проиндексировано строк {rebuild(index)}'
+            ))
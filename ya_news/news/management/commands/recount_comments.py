@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from news.cache import NEWS_LIST_VERSION_KEY, bump_version
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики комментариев у новостей.'
+
+    def handle(self, *args, **options):
+        fixed = News.objects.recount_comments()
+        if fixed:
+            bump_version(NEWS_LIST_VERSION_KEY)
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счётчиков: {fixed}')
+        )
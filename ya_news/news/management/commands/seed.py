@@ -0,0 +1,191 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, reset_queries, transaction
+from django.db.models import Max
+
+from news.cache import NEWS_LIST_VERSION_KEY, bump_version
+from news.models import Comment, News
+
+User = get_user_model()
+
+WORDS = (
+    'город новости сегодня власти жители проект улица школа дорога '
+    'погода выставка концерт парк музей транспорт метро мост район '
+    'фестиваль спорт матч команда сезон открытие ремонт праздник '
+    'театр библиотека больница станция вокзал рынок набережная '
+    'весна лето осень зима утро вечер неделя программа участники'
+).split()
+# Множитель Кнута: раскидывает популярные новости по датам.
+DATE_SPREAD = 2654435761
+# Постоянная дата по умолчанию: прогоны в разные дни дают одни данные.
+DEFAULT_UNTIL = date(2025, 1, 1)
+
+
+def power_law_counts(total, size, alpha):
+    """
+    Делит total на size долей, пропорциональных 1 / rank ** alpha.
+
+    Доли выдаются по одной, а ошибка округления переносится
+    на следующие, так что сумма ровно total при памяти O(1).
+    """
+    norm = sum(rank ** -alpha for rank in range(1, size + 1))
+    cumulative = 0.0
+    emitted = 0
+    for rank in range(1, size + 1):
+        cumulative += rank ** -alpha
+        target = total if rank == size else round(total * cumulative / norm)
+        yield target - emitted
+        emitted = target
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def phrase(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу детерминированными данными для замеров: '
+        'пользователи, новости и комментарии, число которых у новостей '
+        'распределено по степенному закону. Данные дописываются '
+        'к существующим.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--news', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степени: чем больше, тем сильнее перекос.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --until разбросаны новости.'
+        )
+        parser.add_argument(
+            '--until', type=date.fromisoformat, default=DEFAULT_UNTIL,
+            help='Дата самой свежей новости, YYYY-MM-DD.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Строк в одном bulk_create.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100000,
+            help='Строк в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 and options['comments']:
+            raise CommandError('Комментариям нужен хотя бы один автор.')
+        if options['news'] < 1 and options['comments']:
+            raise CommandError('Комментариям нужна хотя бы одна новость.')
+        if User.objects.filter(
+            username__startswith=f'seed{options["seed"]}_'
+        ).exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже есть, '
+                'выберите другое значение.'
+            )
+        self.options = options
+        self.user_base = User.objects.aggregate(Max('pk'))['pk__max'] or 0
+        self.news_base = News.objects.aggregate(Max('pk'))['pk__max'] or 0
+        try:
+            self.seed('Пользователи', User, self.build_users())
+            self.seed('Новости', News, self.build_news())
+            self.seed('Комментарии', Comment, self.build_comments())
+        except DatabaseError as error:
+            raise CommandError(f'Заполнение остановлено: {error!r}')
+        bump_version(NEWS_LIST_VERSION_KEY)
+
+    def seed(self, name, model, objects):
+        """Пишет объекты пачками и сообщает скорость после каждой порции."""
+        created = 0
+        started = perf_counter()
+        for chunk in chunks(objects, self.options['chunk_size']):
+            with transaction.atomic():
+                for batch in chunks(chunk, self.options['batch_size']):
+                    model.objects.bulk_create(batch)
+            # При DEBUG каждый INSERT с тысячами строк оседает в
+            # connection.queries; на 10^8 строк это гигабайты.
+            reset_queries()
+            created += len(chunk)
+            elapsed = perf_counter() - started
+            self.stdout.write(
+                f'{name}: {created}, '
+                f'{created / elapsed:.0f} строк/с'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: создано {created} за {perf_counter() - started:.1f} с'
+        ))
+
+    def build_users(self):
+        password = make_password(None)
+        for number in range(1, self.options['users'] + 1):
+            yield User(
+                pk=self.user_base + number,
+                username=f'seed{self.options["seed"]}_{number}',
+                password=password,
+            )
+
+    def news_date(self, rank):
+        offset = rank * DATE_SPREAD % max(self.options['days'], 1)
+        return self.options['until'] - timedelta(days=offset)
+
+    def build_news(self):
+        """Новость ранга rank получает id news_base + rank."""
+        rng = random.Random(f'{self.options["seed"]}:news')
+        counts = power_law_counts(
+            self.options['comments'], self.options['news'],
+            self.options['alpha']
+        )
+        for rank, comment_count in enumerate(counts, start=1):
+            yield News(
+                pk=self.news_base + rank,
+                title=phrase(rng, 2, 6).capitalize()[:50],
+                text='. '.join(
+                    phrase(rng, 5, 15).capitalize()
+                    for _ in range(rng.randint(2, 8))
+                ) + '.',
+                date=self.news_date(rank),
+                comment_count=comment_count,
+            )
+
+    def build_comments(self):
+        rng = random.Random(f'{self.options["seed"]}:comments')
+        counts = power_law_counts(
+            self.options['comments'], self.options['news'],
+            self.options['alpha']
+        )
+        for rank, comment_count in enumerate(counts, start=1):
+            published = datetime.combine(
+                self.news_date(rank), time(), tzinfo=timezone.utc
+            )
+            for _ in range(comment_count):
+                yield Comment(
+                    news_id=self.news_base + rank,
+                    author_id=self.user_base + rng.randint(
+                        1, self.options['users']
+                    ),
+                    text=phrase(rng, 3, 30).capitalize(),
+                    created=published + timedelta(
+                        seconds=rng.randrange(7 * 24 * 3600)
+                    ),
+                    status=Comment.Status.APPROVED,
+                )
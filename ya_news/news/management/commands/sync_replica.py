@@ -0,0 +1,68 @@
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную БД в реплику DATABASE_REPLICA, имитируя '
+        'репликацию: снимок основной БД попадает в реплику через --lag '
+        'секунд, поэтому реплика отстаёт на --lag..2 * --lag секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag', type=float, default=1,
+            help='Через сколько секунд снимок попадает в реплику.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обновить реплику один раз и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICA:
+            raise CommandError('Не задан путь к реплике DATABASE_REPLICA.')
+        replica = Path(settings.DATABASE_REPLICA)
+        snapshot = replica.with_name(replica.name + '.snapshot')
+        try:
+            while True:
+                started = perf_counter()
+                self.copy(self.primary(), snapshot)
+                time.sleep(options['lag'])
+                with closing(sqlite3.connect(snapshot)) as source:
+                    self.copy(source, replica)
+                self.stdout.write(
+                    f'Реплика обновлена снимком {perf_counter() - started:.1f}'
+                    ' с назад'
+                )
+                if options['once']:
+                    break
+        except (DatabaseError, sqlite3.Error) as error:
+            raise CommandError(f'Синхронизация остановлена: {error!r}')
+        finally:
+            snapshot.unlink(missing_ok=True)
+
+    def primary(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.in_atomic_block:
+            # backup API ждал бы конца собственной транзакции вечно.
+            raise CommandError('Копирование внутри транзакции невозможно.')
+        connection.ensure_connection()
+        return connection.connection
+
+    def copy(self, source, target):
+        """
+        Копирует БД целиком через backup API SQLite.
+
+        Копия согласована, а уже открытые соединения реплики
+        видят новые данные без переподключения.
+        """
+        with closing(sqlite3.connect(target)) as destination:
+            source.backup(destination)
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+# AddField в SQLite пересоздаёт таблицу: это полная перезапись
+# комментариев и потеря триггеров FTS из 0006. ADD COLUMN с константой
+# по умолчанию меняет только схему, а уже написанные комментарии
+# сразу становятся одобренными. Новые строки Django вставляет
+# со статусом из модели (pending), так что DEFAULT в БД на них
+# не влияет.
+ADD_STATUS = (
+    "ALTER TABLE news_comment "
+    "ADD COLUMN status varchar(8) NOT NULL DEFAULT 'approved';"
+)
+DROP_STATUS = 'ALTER TABLE news_comment DROP COLUMN status;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(ADD_STATUS, DROP_STATUS),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='comment',
+                    name='status',
+                    field=models.CharField(choices=[('pending', 'На модерации'), ('approved', 'Одобрен'), ('rejected', 'Отклонён')], default='pending', editable=False, max_length=8),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='comment_pending_idx'),
+        ),
+    ]
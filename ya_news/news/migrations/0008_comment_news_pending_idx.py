@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_comment_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['news'], name='comment_news_pending_idx'),
+        ),
+    ]
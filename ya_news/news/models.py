@@ -2,15 +2,46 @@ from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def recount_comments(self):
+        """
+        Пересчитывает счётчик одобренных комментариев одним UPDATE.
+
+        Возвращает количество новостей, у которых счётчик разошёлся
+        с реальным числом комментариев.
+        """
+        actual = Coalesce(
+            Subquery(
+                Comment.objects.approved().filter(
+                    news=OuterRef('pk')
+                ).order_by().values('news').annotate(
+                    total=Count('pk')
+                ).values('total')
+            ),
+            0
+        )
+        return self.exclude(comment_count=actual).update(
+            comment_count=actual
+        )
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (models.Index(fields=('-date',), name='news_date_idx'),)
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -18,7 +49,23 @@ class News(models.Model):
         return self.title
 
 
+class CommentQuerySet(models.QuerySet):
+
+    def approved(self):
+        """Комментарии, которые видят все."""
+        return self.filter(status=Comment.Status.APPROVED)
+
+    def unapproved(self):
+        return self.exclude(status=Comment.Status.APPROVED)
+
+
 class Comment(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'На модерации'
+        APPROVED = 'approved', 'Одобрен'
+        REJECTED = 'rejected', 'Отклонён'
+
     news = models.ForeignKey(
         News,
         on_delete=models.CASCADE
@@ -28,10 +75,45 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
     )
     text = models.TextField()
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(default=timezone.now, editable=False)
+    status = models.CharField(
+        max_length=8,
+        choices=Status.choices,
+        default=Status.PENDING,
+        editable=False,
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_id_idx',
+            ),
+            # Очередь модерации: в индексе только ожидающие комментарии,
+            # поэтому он мал и воркер выбирает пачку без просмотра таблицы.
+            models.Index(
+                fields=('id',),
+                name='comment_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+            # Ожидающие по новостям: счётчик в админке не перебирает
+            # все комментарии популярной новости.
+            models.Index(
+                fields=('news',),
+                name='comment_news_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает статус из БД, чтобы сигнал заметил его смену."""
+        comment = super().from_db(db, field_names, values)
+        comment._loaded_status = comment.__dict__.get('status')
+        return comment
@@ -0,0 +1,159 @@
+"""
+Модерация комментариев.
+
+Форма в запросе проверяет только стоп-слова. Остальные проверки
+выполняет воркер moderate_comments: он пачками разбирает очередь
+комментариев в статусе pending, поэтому более дорогая модерация
+не замедляет публикацию комментария.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.admin.models import DELETION, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .cache import bump_news_version
+from .models import Comment, News
+from .signals import bulk_comment_delete
+
+LINK = re.compile(r'https?://|www\.', re.IGNORECASE)
+REPEATED_SYMBOL = re.compile(r'(.)\1{9,}')
+DELETE_BATCH_SIZE = 500
+
+
+def too_many_links(text):
+    return len(LINK.findall(text)) > settings.COMMENT_MAX_LINKS
+
+
+def is_shouting(text):
+    """Длинный текст заглавными буквами."""
+    letters = [symbol for symbol in text if symbol.isalpha()]
+    return len(letters) >= 20 and sum(
+        symbol.isupper() for symbol in letters
+    ) > len(letters) * 0.7
+
+
+def is_repetitive(text):
+    return REPEATED_SYMBOL.search(text) is not None
+
+
+CHECKS = (too_many_links, is_shouting, is_repetitive)
+
+
+def review(text):
+    """Статус, который модерация присваивает тексту."""
+    if any(check(text) for check in CHECKS):
+        return Comment.Status.REJECTED
+    return Comment.Status.APPROVED
+
+
+def refresh_news(news_ids):
+    """
+    Пересчитывает счётчики новостей одним UPDATE и меняет их версии.
+
+    Вызывается после фиксации изменений комментариев, чтобы кеш
+    не успел заполниться старыми данными.
+    """
+    news_ids = set(news_ids)
+    News.objects.filter(pk__in=news_ids).recount_comments()
+    for news_id in news_ids:
+        bump_news_version(news_id)
+
+
+def by_pk(queryset):
+    """
+    Тот же набор комментариев без join, extra() и сортировки queryset.
+
+    Поиск в админке добавляет к queryset таблицу FTS, а UPDATE
+    и DELETE должны строиться по одной таблице.
+    """
+    return Comment.objects.filter(pk__in=queryset.values('pk'))
+
+
+def set_status(queryset, status):
+    """Меняет статус комментариев queryset одним UPDATE."""
+    queryset = by_pk(queryset)
+    with transaction.atomic():
+        news_ids = list(
+            queryset.order_by().values_list('news_id', flat=True).distinct()
+        )
+        updated = queryset.exclude(status=status).update(status=status)
+    refresh_news(news_ids)
+    return updated
+
+
+def log_deletions(user, comments):
+    """Записывает удаление пачки (pk, текст) в журнал админки одним INSERT."""
+    content_type = ContentType.objects.get_for_model(Comment)
+    LogEntry.objects.bulk_create(
+        LogEntry(
+            user_id=user.pk,
+            content_type_id=content_type.pk,
+            object_id=str(pk),
+            object_repr=str(Comment(text=text)),
+            action_flag=DELETION,
+        )
+        for pk, text in comments
+    )
+
+
+def delete_comments(queryset, user=None):
+    """
+    Удаляет комментарии queryset пачками по DELETE_BATCH_SIZE.
+
+    Обработчики post_delete на время удаления отключены: иначе каждый
+    комментарий отдельным запросом обновлял бы счётчик своей новости.
+    Счётчики пересчитываются один раз на все новости. Если передан
+    user, удаление записывается в журнал админки от его имени.
+    """
+    queryset = by_pk(queryset).order_by('pk')
+    deleted = 0
+    with transaction.atomic(), bulk_comment_delete():
+        news_ids = list(
+            queryset.order_by().values_list('news_id', flat=True).distinct()
+        )
+        last_pk = 0
+        while True:
+            comments = list(queryset.filter(
+                pk__gt=last_pk
+            ).values_list('pk', 'text')[:DELETE_BATCH_SIZE])
+            if not comments:
+                break
+            last_pk = comments[-1][0]
+            if user is not None:
+                log_deletions(user, comments)
+            deleted += Comment.objects.filter(
+                pk__in=[pk for pk, _ in comments]
+            ).delete()[0]
+            if len(comments) < DELETE_BATCH_SIZE:
+                break
+    refresh_news(news_ids)
+    return deleted
+
+
+def moderate(batch_size):
+    """
+    Разбирает одну пачку очереди и возвращает число решений по статусам.
+
+    Пачка читается и обновляется в одной транзакции: если автор успел
+    изменить комментарий, SQLite не даст записать решение по старому
+    тексту. Статусы обновляются одним UPDATE на статус, а после
+    фиксации пересчитываются счётчики и версии затронутых новостей.
+    """
+    decisions = defaultdict(list)
+    with transaction.atomic():
+        pending = Comment.objects.filter(
+            status=Comment.Status.PENDING
+        ).order_by('pk').values_list('pk', 'news_id', 'text')[:batch_size]
+        touched = set()
+        for pk, news_id, text in pending:
+            decisions[review(text)].append(pk)
+            touched.add(news_id)
+        for status, pks in decisions.items():
+            Comment.objects.filter(
+                pk__in=pks, status=Comment.Status.PENDING
+            ).update(status=status)
+    refresh_news(touched)
+    return {status: len(pks) for status, pks in decisions.items()}
@@ -0,0 +1,148 @@
+"""
+Кеш целых страниц для анонимных читателей.
+
+Ключ страницы включает версию новости или списка новостей из
+news.cache, поэтому изменение News или Comment сразу делает прежнюю
+копию недоступной. Запросы с cookie сессии идут мимо кеша.
+
+В ключ входят путь и только те GET-параметры, которые читает
+представление, в каноническом виде: метки вроде utm_source и
+разные записи одного курсора не плодят копии страницы.
+
+Истёкшую страницу перестраивает один запрос - тот, кто первым взял
+блокировку через cache.add. Остальные отдают предыдущую версию
+страницы, а если её нет, недолго ждут новую.
+
+Версия меняется сразу после записи, а реплика БД отстаёт, поэтому
+страница для кеша строится по основной БД.
+"""
+import hashlib
+from time import monotonic, sleep
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from yanews.replica import pin_primary
+
+from .cache import get_news_list_version, get_news_version
+from .pagination import clean_cursor
+
+PAGE_KEY = 'page:{url}:{version}'
+STALE_PAGE_KEY = 'page:{url}:stale'
+REBUILD_LOCK_KEY = 'page:{url}:lock'
+WAIT_STEP = 0.05
+
+
+def list_version(kwargs):
+    return get_news_list_version()
+
+
+def news_version(kwargs):
+    return get_news_version(kwargs['pk'])
+
+
+# Кешируемые страницы и версия, от которой зависит их содержимое.
+PAGE_VERSIONS = {
+    'news:home': list_version,
+    'news:api_list': list_version,
+    'news:detail': news_version,
+    'news:api_detail': news_version,
+}
+
+# GET-параметры, которые читают кешируемые страницы, и их нормализация.
+PAGE_PARAMS = {
+    'news:detail': {'after': clean_cursor},
+    'news:api_detail': {'after': clean_cursor},
+}
+
+
+def page_url(request):
+    """Хеш пути и канонических GET-параметров страницы."""
+    params = PAGE_PARAMS.get(request.resolver_match.view_name, {})
+    query = {}
+    for name, clean in params.items():
+        value = clean(request.GET.get(name, ''))
+        if value:
+            query[name] = value
+    query = urlencode(sorted(query.items()))
+    url = f'{request.path}?{query}' if query else request.path
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def is_cacheable_response(request, response):
+    # Страница с CSRF-токеном привязана к cookie того, кто её получил.
+    return (
+        not request.META.get('CSRF_COOKIE_USED')
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """Отдаёт анонимным GET-запросам готовые страницы из кеша."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method != 'GET'
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return None
+        version = PAGE_VERSIONS.get(request.resolver_match.view_name)
+        if version is None:
+            return None
+        url = page_url(request)
+        key = PAGE_KEY.format(url=url, version=version(view_kwargs))
+        response = cache.get(key)
+        if response is None:
+            response = self.wait_for_rebuild(request, url)
+        if response is None:
+            request.page_cache = {
+                'key': key, 'url': url, 'primary': pin_primary(),
+            }
+            return None
+        # Сессию никто не читал, и SessionMiddleware не добавит Vary.
+        patch_vary_headers(response, ('Cookie',))
+        return get_conditional_response(
+            request, etag=response.get('ETag'), response=response
+        )
+
+    def wait_for_rebuild(self, request, url):
+        """
+        Защита от лавины запросов к истёкшей странице.
+
+        Возвращает None, если страницу должен построить этот запрос.
+        """
+        lock_key = REBUILD_LOCK_KEY.format(url=url)
+        if cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            request.page_cache_lock = lock_key
+            return None
+        stale = cache.get(STALE_PAGE_KEY.format(url=url))
+        if stale is not None:
+            return stale
+        deadline = monotonic() + settings.PAGE_CACHE_WAIT
+        while monotonic() < deadline:
+            sleep(WAIT_STEP)
+            stale = cache.get(STALE_PAGE_KEY.format(url=url))
+            if stale is not None:
+                return stale
+        return None
+
+    def process_response(self, request, response):
+        page_cache = getattr(request, 'page_cache', None)
+        if page_cache is None:
+            return response
+        pin_primary(page_cache['primary'])
+        if is_cacheable_response(request, response):
+            cache.set_many({
+                page_cache['key']: response,
+                STALE_PAGE_KEY.format(url=page_cache['url']): response,
+            }, settings.PAGE_CACHE_TIMEOUT)
+        lock_key = getattr(request, 'page_cache_lock', None)
+        if lock_key is not None:
+            cache.delete(lock_key)
+        return response
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Больше не помещается в целое SQLite.
+MAX_PK = 2 ** 63 - 1
+
+
+def format_cursor(created, pk):
+    """Курсор на позицию: микросекунды created и id через дефис."""
+    return f'{(created - EPOCH) // MICROSECOND}-{pk}'
+
+
+def encode_cursor(comment):
+    return format_cursor(comment.created, comment.pk)
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для некорректного значения возвращает None."""
+    try:
+        created, pk = (int(part) for part in cursor.split('-'))
+        position = EPOCH + created * MICROSECOND, pk
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    if pk > MAX_PK:
+        return None
+    return position
+
+
+def clean_cursor(cursor):
+    """
+    Курсор в каноническом виде; некорректный - пустая строка.
+
+    Разные записи одной позиции ('007-1' и '7-1') дают один курсор,
+    а некорректные - первую страницу.
+    """
+    position = decode_cursor(cursor)
+    if position is None:
+        return ''
+    return format_cursor(*position)
+
+
+def keyset_page(queryset, cursor, size):
+    """
+    Страница комментариев после курсора в порядке (created, id).
+
+    Вместо OFFSET условие на ключ сортировки позволяет индексу
+    (news, created, id) сразу встать на начало страницы, поэтому
+    дальние страницы стоят столько же, сколько первая.
+    Возвращает объекты страницы и курсор следующей страницы.
+    """
+    queryset = queryset.order_by('created', 'pk')
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        created, pk = position
+        queryset = queryset.filter(
+            created__gte=created
+        ).exclude(created=created, pk__lte=pk)
+    objects = list(queryset[:size + 1])
+    if len(objects) <= size:
+        return objects, None
+    objects = objects[:size]
+    return objects, encode_cursor(objects[-1])
@@ -0,0 +1,156 @@
+"""
+Поиск запрещённых слов в тексте автоматом Ахо — Корасик.
+
+Время проверки зависит только от длины текста, а не от размера
+словаря. Слова словаря и проверяемый текст приводятся к одному виду:
+латиница и цифры, похожие на кириллицу, заменяются кириллицей,
+«ё» становится «е», слова разделяются одним пробелом, а повторы
+одной буквы схлопываются. Буквы вразрядку («р е д и с к а»)
+склеиваются в одно слово.
+"""
+import os
+import time
+from collections import deque
+from itertools import groupby
+from threading import Lock
+
+from django.conf import settings
+
+LOOKALIKES = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у', 'ё': 'е',
+    '0': 'о', '3': 'з', '6': 'б', '@': 'а',
+})
+
+
+def split_words(text):
+    """Слова текста; одиночные буквы подряд - одно слово вразрядку."""
+    words = (
+        ''.join(chars) for is_letter, chars
+        in groupby(text.lower().translate(LOOKALIKES), str.isalpha)
+        if is_letter
+    )
+    for single, group in groupby(words, lambda word: len(word) == 1):
+        if single:
+            yield ''.join(group)
+        else:
+            yield from group
+
+
+def normalize(text):
+    """
+    Слова через пробел без повторов букв.
+
+    Пробела нет в словах словаря, поэтому совпадение не переходит
+    границу слов: «ух, ерунда» не содержит «хер».
+    """
+    return ' '.join(
+        ''.join(char for char, _ in groupby(word))
+        for word in split_words(text)
+    )
+
+
+class Automaton:
+    """Автомат Ахо — Корасик над нормализованными словами."""
+
+    def __init__(self, words):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+        for word in words:
+            self._add(normalize(word))
+        self._link()
+
+    def _add(self, word):
+        if not word:
+            return
+        node = 0
+        for char in word:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(False)
+                self.goto[node][char] = child
+            node = child
+        self.terminal[node] = True
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                if self.terminal[self.fail[child]]:
+                    self.terminal[child] = True
+
+    def search(self, text):
+        """Есть ли в тексте хотя бы одно слово словаря."""
+        goto, fail, terminal = self.goto, self.fail, self.terminal
+        node = 0
+        for char in normalize(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if terminal[node]:
+                return True
+        return False
+
+
+class ProfanityMatcher:
+    """
+    Словарь запрещённых слов на процесс.
+
+    К встроенным словам добавляются слова из файла settings.BAD_WORDS_FILE
+    (по одному в строке). Не чаще раза в BAD_WORDS_RELOAD_INTERVAL секунд
+    проверяется время изменения файла, и при изменении автомат
+    пересобирается без перезапуска процесса.
+    """
+
+    def __init__(self, words):
+        self.words = tuple(words)
+        self.automaton = None
+        self.source = None
+        self.checked_at = None
+        self.lock = Lock()
+
+    def search(self, text):
+        return self.get_automaton().search(text)
+
+    def get_automaton(self):
+        now = time.monotonic()
+        if (
+            self.automaton is not None
+            and self.source[0] == settings.BAD_WORDS_FILE
+            and now - self.checked_at < settings.BAD_WORDS_RELOAD_INTERVAL
+        ):
+            return self.automaton
+        with self.lock:
+            source = self.get_source()
+            if self.automaton is None or source != self.source:
+                self.automaton = Automaton(self.words + self.read(source))
+                self.source = source
+            self.checked_at = now
+        return self.automaton
+
+    @staticmethod
+    def get_source():
+        path = settings.BAD_WORDS_FILE
+        if not path:
+            return path, None
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return path, None
+
+    @staticmethod
+    def read(source):
+        if source[1] is None:
+            return ()
+        with open(source[0], encoding='utf-8') as words_file:
+            return tuple(line.strip() for line in words_file if line.strip())
@@ -1,26 +1,137 @@
+from copy import deepcopy
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
 import pytest
 from django.conf import settings
-from django.test import Client
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
 from django.urls import reverse
-from django.utils import timezone
 
 from news.forms import BAD_WORDS
 from news.models import Comment, News
+from yanews.query_budget import query_budget as check_query_budget
 
 
-@pytest.fixture
-def news():
-    return News.objects.create(
-        title='Title',
-        text='Text',
+# Стойкость хеша паролей в тестах не нужна, а PBKDF2 - самая дорогая
+# часть создания пользователя с паролем.
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.fixture(scope='session', autouse=True)
+def fast_password_hasher():
+    with override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS):
+        yield
+
+
+# Кеш в памяти процесса: тесты не делят кеш с запущенным сервером.
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+@pytest.fixture(scope='session', autouse=True)
+def local_cache():
+    with override_settings(CACHES=LOCAL_CACHES):
+        yield
+
+
+def build_snapshot():
+    """
+    Граф объектов, общий для всех тестов сессии.
+
+    Администратор нужен admin_user из pytest-django: тот находит его
+    по имени, а не создаёт заново с хешированием пароля. Новость
+    news получает комментарий comment и ещё десять комментариев
+    comments_list; news_list - отдельные новости для главной,
+    начиная со вчерашней, чтобы порядок на ней был однозначным.
+    Комментарии вставляются через bulk_create, поэтому счётчик
+    новости пересчитывается здесь.
+    """
+    User = get_user_model()
+    User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='password'
+    )
+    author = User.objects.create(username='IamGroot')
+    news = News.objects.create(title='Title', text='Text')
+    comment = Comment.objects.create(
+        news=news, author=author, text='Text',
+        status=Comment.Status.APPROVED,
+    )
+    Comment.objects.bulk_create(
+        Comment(
+            news=news, author=author, text=f'Tекст {index}',
+            created=comment.created + timedelta(days=index),
+            status=Comment.Status.APPROVED,
+        )
+        for index in range(1, 11)
+    )
+    News.objects.filter(pk=news.pk).recount_comments()
+    news.refresh_from_db()
+    today = datetime.today()
+    News.objects.bulk_create(
+        News(
+            title=f'Новость {index}',
+            text='Просто текст.',
+            date=today - timedelta(days=index + 1)
+        )
+        for index in range(settings.NEWS_COUNT_ON_HOME_PAGE + 1)
+    )
+    # bulk_create в SQLite не возвращает id созданных строк.
+    comments_list = list(news.comment_set.exclude(pk=comment.pk))
+    news_list = list(News.objects.exclude(pk=news.pk).order_by('-date'))
+    return SimpleNamespace(
+        author=author, news=news, comment=comment,
+        comments_list=comments_list, news_list=news_list,
     )
 
 
+@pytest.fixture(scope='session', autouse=True)
+def snapshot(django_db_setup, django_db_blocker, fast_password_hasher):
+    """
+    Снимок тестовой базы, общий для всей сессии.
+
+    Граф build_snapshot() создаётся и фиксируется один раз, до первой
+    транзакции теста. Обычный тест идёт в транзакции, откат которой
+    возвращает базу к снимку; фикстуры отдают копии объектов снимка,
+    как setUpTestData в TestCase, и не обращаются к базе.
+
+    Транзакционный тест очищает базу в конце через flush, поэтому
+    такие тесты помечаются serialized_rollback=True: перед каждым
+    из них Django загружает снимок из сериализованной копии.
+    """
+    with django_db_blocker.unblock():
+        objects = build_snapshot()
+        connection._test_serialized_contents = (
+            connection.creation.serialize_db_to_string()
+        )
+    return objects
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """Контекстный менеджер, проверяющий бюджет запросов страницы."""
+    return check_query_budget
+
+
+@pytest.fixture
+def news(snapshot, db):
+    return deepcopy(snapshot.news)
+
+
 @pytest.fixture
-def author(django_user_model):
-    return django_user_model.objects.create(username='IamGroot')
+def author(snapshot, db):
+    return deepcopy(snapshot.author)
 
 
 @pytest.fixture
@@ -31,36 +142,18 @@ def author_client(author):
 
 
 @pytest.fixture
-def comment(author, news):
-    return Comment.objects.create(
-        news=news,
-        author=author,
-        text='Text',
-    )
+def comment(snapshot, db):
+    return deepcopy(snapshot.comment)
 
 
 @pytest.fixture
-def news_list():
-    today = datetime.today()
-    return News.objects.bulk_create(
-        News(
-            title=f'Новость {index}',
-            text='Просто текст.',
-            date=today - timedelta(days=index)
-        )
-        for index in range(settings.NEWS_COUNT_ON_HOME_PAGE + 1)
-    )
+def news_list(snapshot, db):
+    return deepcopy(snapshot.news_list)
 
 
 @pytest.fixture
-def comments_list(news, author):
-    now = timezone.now()
-    for index in range(10):
-        comment = Comment.objects.create(
-            news=news, author=author, text=f'Tекст {index}',
-        )
-        comment.created = now + timedelta(days=index)
-        comment.save()
+def comments_list(snapshot, db):
+    return deepcopy(snapshot.comments_list)
 
 
 @pytest.fixture
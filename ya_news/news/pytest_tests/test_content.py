@@ -1,7 +1,19 @@
+import hashlib
+import json
+from http import HTTPStatus
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
 
 from news.forms import CommentForm
+from news import page_cache, views
+from news.cache import COMMENTS_BLOCK_KEY, get_news_version
+from news.models import Comment, News
 
 
 @pytest.mark.django_db
@@ -11,6 +23,16 @@ def test_news_count(client, news_list, home_url):
     ) == settings.NEWS_COUNT_ON_HOME_PAGE
 
 
+@pytest.mark.django_db
+def test_home_page_uses_comment_counter(
+    client, news, comments_list, home_url, django_assert_num_queries
+):
+    with django_assert_num_queries(1):
+        content = client.get(home_url).content.decode()
+    assert news.comment_count == len(comments_list) + 1
+    assert f'Комментариев: {news.comment_count}' in content
+
+
 @pytest.mark.django_db
 def test_news_order(client, news_list, home_url):
     all_dates = [
@@ -48,3 +70,290 @@ def test_availability_form_for_different_users(
     ) == form_is_available
     if form_is_available:
         assert isinstance(context['form'], CommentForm)
+
+
+@pytest.mark.django_db
+def test_comments_block_is_cached_per_version(
+    client, comment, detail_url, django_assert_num_queries, settings
+):
+    settings.MIDDLEWARE = [
+        name for name in settings.MIDDLEWARE
+        if name != 'news.page_cache.AnonymousPageCacheMiddleware'
+    ]
+    client.get(detail_url)
+    with django_assert_num_queries(1):
+        client.get(detail_url)
+    comment.text = 'Новый текст'
+    comment.save()
+    assert 'Новый текст' in client.get(detail_url).content.decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'custom_client, links_are_shown',
+    (
+        (pytest.lazy_fixture('author_client'), True),
+        (pytest.lazy_fixture('admin_client'), False),
+        (pytest.lazy_fixture('client'), False),
+    )
+)
+def test_comment_links_for_different_users(
+    custom_client, links_are_shown, comment, detail_url
+):
+    custom_client.get(detail_url)
+    content = custom_client.get(detail_url).content.decode()
+    assert (
+        reverse('news:edit', args=(comment.pk,)) in content
+    ) == links_are_shown
+
+
+@pytest.mark.django_db
+def test_comments_keyset_pagination(
+    settings, client, news, comments_list, detail_url
+):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 3
+    pages = []
+    cursor = ''
+    while True:
+        context = client.get(detail_url, {'after': cursor}).context
+        pages.append([comment['pk'] for comment in context['comments']])
+        cursor = context['next_cursor']
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    assert sum(pages, []) == list(
+        news.comment_set.order_by('created', 'pk').values_list(
+            'pk', flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('after', (
+    '0-99999999999999999999999',
+    f'0-{2 ** 63}',
+    '99999999999999999999999-1',
+    '1-2-3',
+    'x',
+))
+def test_invalid_cursor_shows_first_page(
+    client, news, comments_list, after
+):
+    url = reverse('news:detail', args=(news.pk,))
+    response = client.get(url, {'after': after})
+    assert response.status_code == HTTPStatus.OK
+    # Блок закеширован под ключом первой страницы.
+    assert cache.get(COMMENTS_BLOCK_KEY.format(
+        news_id=news.pk, version=get_news_version(news.pk), cursor=''
+    )) is not None
+    assert response.content == client.get(url).content
+    url = reverse('news:api_detail', args=(news.pk,))
+    response = client.get(url, {'after': after})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == client.get(url).json()
+
+
+@pytest.mark.django_db
+def test_api_list(client, news, news_list):
+    results = client.get(reverse('news:api_list')).json()['results']
+    assert len(results) == settings.NEWS_COUNT_ON_HOME_PAGE
+    assert [item['title'] for item in results[:2]] == [
+        news.title, news_list[0].title
+    ]
+
+
+@pytest.mark.django_db
+def test_api_detail_contains_comments(client, news, comments_list):
+    data = client.get(reverse('news:api_detail', args=(news.pk,))).json()
+    assert data['title'] == news.title
+    assert [comment['text'] for comment in data['comments']] == list(
+        news.comment_set.values_list('text', flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_api_export_streams_all_rows(
+    settings, author_client, news_list, comments_list
+):
+    settings.NEWS_EXPORT_CHUNK_SIZE = 3
+    response = author_client.get(reverse('news:api_export'))
+    assert response.streaming
+    rows = [
+        json.loads(line)
+        for line in b''.join(response.streaming_content).splitlines()
+    ]
+    assert [row['model'] for row in rows] == (
+        ['news'] * News.objects.count() + ['comment'] * Comment.objects.count()
+    )
+
+
+@pytest.mark.django_db
+def test_api_export_is_forbidden_for_anonymous(client):
+    assert client.get(
+        reverse('news:api_export')
+    ).status_code == HTTPStatus.FORBIDDEN
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url',
+    (pytest.lazy_fixture('home_url'), pytest.lazy_fixture('detail_url'))
+)
+def test_not_modified_without_rendering(
+    url, author_client, comment_form_data, detail_url
+):
+    etag = author_client.get(url)['ETag']
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.templates == []
+    author_client.post(detail_url, data=comment_form_data)
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_etag_depends_on_user(client, author_client, detail_url):
+    etag = author_client.get(detail_url)['ETag']
+    assert client.get(
+        detail_url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+def test_etag_changes_with_csrf_token_after_login(
+    django_user_model, detail_url, login_url, logout_url
+):
+    django_user_model.objects.create_user(
+        username='reader', password='password'
+    )
+    client = Client(enforce_csrf_checks=True)
+
+    def log_in():
+        client.get(login_url)
+        client.post(login_url, {
+            'username': 'reader',
+            'password': 'password',
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+        })
+
+    log_in()
+    etag = client.get(detail_url)['ETag']
+    assert client.get(
+        detail_url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == HTTPStatus.NOT_MODIFIED
+    client.get(logout_url)
+    log_in()
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert client.post(detail_url, {
+        'text': 'Комментарий',
+        'csrfmiddlewaretoken': str(response.context['csrf_token']),
+    }).status_code == HTTPStatus.FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url',
+    (pytest.lazy_fixture('home_url'), pytest.lazy_fixture('detail_url'))
+)
+def test_anonymous_pages_are_served_from_cache(
+    url, client, comment, django_assert_num_queries
+):
+    client.get(url)
+    with django_assert_num_queries(0):
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert 'Cookie' in response['Vary']
+    assert client.get(
+        url, HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == HTTPStatus.NOT_MODIFIED
+    comment.news.title = 'Новый заголовок'
+    comment.news.save()
+    assert 'Новый заголовок' in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_page_cache_bypassed_with_session(author_client, detail_url):
+    author_client.get(detail_url)
+    assert author_client.get(detail_url).templates
+
+
+@pytest.mark.django_db
+def test_page_cache_ignores_unknown_params(
+    client, detail_url, django_assert_num_queries
+):
+    client.get(detail_url)
+    for query in ('?utm_source=mail', '?after=junk&utm_source=mail'):
+        with django_assert_num_queries(0):
+            client.get(detail_url + query)
+
+
+@pytest.mark.django_db
+def test_page_rebuilt_once_while_locked(
+    client, news, detail_url, django_assert_num_queries
+):
+    client.get(detail_url)
+    news.title = 'Новый заголовок'
+    news.save()
+    url = hashlib.md5(detail_url.encode()).hexdigest()
+    cache.add(page_cache.REBUILD_LOCK_KEY.format(url=url), 1)
+    with django_assert_num_queries(0):
+        content = client.get(detail_url).content.decode()
+    assert 'Новый заголовок' not in content
+    cache.delete(page_cache.REBUILD_LOCK_KEY.format(url=url))
+    assert 'Новый заголовок' in client.get(detail_url).content.decode()
+
+
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_async_views_render_in_db_executor(
+    rf, news, comments_list, home_url, detail_url
+):
+    for view, url, kwargs in (
+        (views.async_news_list, home_url, {}),
+        (views.async_news_detail, detail_url, {'pk': news.pk}),
+    ):
+        request = rf.get(url)
+        request.user = AnonymousUser()
+        response = async_to_sync(view)(request, **kwargs)
+        assert response.status_code == HTTPStatus.OK
+        assert news.title in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_search_ranks_title_above_text_and_escapes(client, news):
+    in_text = News.objects.create(
+        title='Прогноз', text='<b>Дождь</b> весь день, дождь и ветер.'
+    )
+    in_title = News.objects.create(title='Дождь', text='Без подробностей.')
+    context = client.get(reverse('news:search'), {'q': 'дожд'}).context
+    assert [item.pk for item in context['news_results']] == [
+        in_title.pk, in_text.pk
+    ]
+    assert context['news_results'][1].snippet == (
+        '&lt;b&gt;<mark>Дождь</mark>&lt;/b&gt; весь день, '
+        '<mark>дождь</mark> и ветер.'
+    )
+
+
+@pytest.mark.django_db
+def test_search_follows_comment_changes(client, comment):
+    search_url = reverse('news:search')
+    comment.text = 'Уникальное слово'
+    comment.save()
+    results = client.get(
+        search_url, {'q': 'уникальн'}
+    ).context['comment_results']
+    assert [item.pk for item in results] == [comment.pk]
+    comment.delete()
+    assert not client.get(
+        search_url, {'q': 'уникальн'}
+    ).context['comment_results']
+
+
+@pytest.mark.django_db
+def test_search_ignores_fts_syntax(client, news):
+    response = client.get(reverse('news:search'), {'q': '" OR * ('})
+    assert response.status_code == HTTPStatus.OK
+    assert response.context['news_results'] == []
+    assert response.context['comment_results'] == []
@@ -1,10 +1,42 @@
+import asyncio
+import csv
+import os
+import sqlite3
+from contextlib import closing
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.admin.models import DELETION, LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, reset_queries
+from django.http import HttpResponse
+from django.test import Client
+from django.urls import reverse
 from pytest_django.asserts import assertFormError, assertRedirects
 
-from news.forms import WARNING
-from news.models import Comment
+from news.cache import get_news_list_version
+from news.forms import WARNING, CommentForm
+from news.management.commands.index_advisor import (
+    Command as IndexAdvisor, suggest_index
+)
+from news.models import Comment, News
+from news import moderation
+from news.moderation import moderate
+from news.search import NEWS_INDEX, search
+from yanews.auth import (
+    USER_KEY, CachedModelBackend, forget_user, get_user_version
+)
+from yanews.ratelimit import RateLimitMiddleware
+from yanews.replica import (
+    PrimaryStickinessMiddleware, ReplicaRouter, primary
+)
+from yanews.sqlite import apply_pragmas
 
 
 @pytest.mark.django_db
@@ -22,6 +54,7 @@ def test_user_can_create_comment(
     assert comment.text == comment_form_data['text']
     assert comment.author == author
     assert comment.news == news
+    assert comment.status == Comment.Status.PENDING
 
 
 @pytest.mark.django_db
@@ -36,6 +69,53 @@ def test_anonymous_user_cant_create_comment(
     assert set(Comment.objects.all()) == comments_before
 
 
+@pytest.mark.django_db
+def test_comment_rate_limit(
+    author_client, comment_form_data, detail_url, settings,
+    django_assert_num_queries
+):
+    settings.RATE_LIMITS = {'news:detail': {'requests': 2, 'period': 60}}
+    comments_before = Comment.objects.count()
+    for _ in range(2):
+        assert author_client.post(
+            detail_url, data=comment_form_data
+        ).status_code == HTTPStatus.FOUND
+    # Сессия и пользователь: до представления запрос не доходит.
+    with django_assert_num_queries(2):
+        response = author_client.post(detail_url, data=comment_form_data)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert 0 < int(response['Retry-After']) <= 60
+    assert Comment.objects.count() == comments_before + 2
+    assert author_client.get(detail_url).status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+def test_signup_rate_limit_per_ip(client, settings):
+    settings.RATE_LIMITS = {'users:signup': {'requests': 1, 'period': 60}}
+    signup_url = reverse('users:signup')
+    client.post(signup_url)
+    assert client.post(
+        signup_url
+    ).status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert Client(REMOTE_ADDR='10.0.0.2').post(
+        signup_url
+    ).status_code == HTTPStatus.OK
+
+
+def test_rate_limits_require_atomic_cache(settings, tmp_path):
+    settings.RATE_LIMITS = {'users:signup': {'requests': 1, 'period': 60}}
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tmp_path,
+        }
+    }
+    with pytest.raises(ImproperlyConfigured):
+        RateLimitMiddleware(HttpResponse)
+    settings.RATE_LIMITS = {}
+    RateLimitMiddleware(HttpResponse)
+
+
 @pytest.mark.django_db
 def test_user_cant_use_bad_words(
     detail_url, admin_client, comment_form_data_with_bad_word
@@ -86,6 +166,7 @@ def test_author_can_edit_comment(
     assert comment_after_edit.text == comment_form_data['text']
     assert comment_after_edit.author == comment.author
     assert comment_after_edit.news == comment.news
+    assert comment_after_edit.status == Comment.Status.PENDING
 
 
 def test_user_cant_edit_comment_of_another_user(
@@ -99,3 +180,510 @@ def test_user_cant_edit_comment_of_another_user(
     assert comment_from_db.author == comment.author
     assert comment_from_db.text == comment.text
     assert comment_from_db.created == comment.created
+
+
+@pytest.mark.parametrize(
+    'text',
+    (
+        'Ну ты и РЕДИСКА!',
+        'нeгодяй',
+        'р-е-д-и-с-к-а',
+        'р е д и с к а',
+        'реддиииска',
+        'pедиcкa',
+    )
+)
+def test_bad_words_are_normalized(text):
+    form = CommentForm(data={'text': text})
+    assert not form.is_valid()
+    assert form.errors['text'] == [WARNING]
+
+
+@pytest.mark.parametrize(
+    'text', ('Весь ред, иска не подавали', 'Там нег. Одяй не приходил')
+)
+def test_bad_words_do_not_cross_word_boundaries(text):
+    assert CommentForm(data={'text': text}).is_valid()
+
+
+def test_bad_words_file_is_reloaded(settings, tmp_path):
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('паршивец\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = str(words_file)
+    settings.BAD_WORDS_RELOAD_INTERVAL = 0
+    assert not CommentForm(data={'text': 'Ёжик паршивец'}).is_valid()
+    assert CommentForm(data={'text': 'Ёжик-хулиган'}).is_valid()
+    words_file.write_text('хулиган\n', encoding='utf-8')
+    os.utime(words_file, ns=(0, 0))
+    assert CommentForm(data={'text': 'Ёжик паршивец'}).is_valid()
+    assert not CommentForm(data={'text': 'Ёжик-хулиган'}).is_valid()
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_create_and_delete(
+    author_client, comment_form_data, news, detail_url, delete_url
+):
+    author_client.post(detail_url, data=comment_form_data)
+    assert News.objects.get(pk=news.pk).comment_count == news.comment_count
+    call_command('moderate_comments', once=True, stdout=StringIO())
+    assert News.objects.get(
+        pk=news.pk
+    ).comment_count == news.comment_count + 1
+    author_client.delete(delete_url)
+    assert News.objects.get(pk=news.pk).comment_count == news.comment_count
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_bulk_delete(news, comments_list):
+    Comment.objects.filter(news=news).exclude(text__endswith='0').delete()
+    assert News.objects.get(pk=news.pk).comment_count == 1
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(news, comment, comments_list):
+    News.objects.update(comment_count=100)
+    call_command('recount_comments')
+    assert News.objects.get(
+        pk=news.pk
+    ).comment_count == len(comments_list) + 1
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index_command(news):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {NEWS_INDEX}({NEWS_INDEX}) VALUES ('delete-all')"
+        )
+    news_by_text = search(News.objects.all(), NEWS_INDEX, 'text', 1, '1, 1')
+    assert not news_by_text.exists()
+    call_command('rebuild_search_index', stdout=StringIO())
+    assert list(news_by_text.all()) == [news]
+
+
+@pytest.mark.django_db
+def test_import_news_command(
+    tmp_path, author, django_capture_on_commit_callbacks
+):
+    news_file = tmp_path / 'news.jsonl'
+    news_file.write_text(
+        '{"id": 1000, "title": "Импорт", "text": "Текст", '
+        '"date": "2022-01-02"}\n',
+        encoding='utf-8'
+    )
+    comments_file = tmp_path / 'comments.csv'
+    comments_file.write_text(
+        'news_id,author,text,created\n'
+        f'1000,{author.username},Первый,2022-01-02T10:00:00\n'
+        '1000,newcomer,Второй,2022-01-02T11:00:00+03:00\n'
+        '1000,stranger,Третий,2022-01-02T12:00:00\n',
+        encoding='utf-8'
+    )
+    list_version = get_news_list_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('import_news', str(news_file), batch_size=1)
+    assert get_news_list_version() != list_version
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command(
+            'import_news', str(comments_file), model='comments',
+            batch_size=2
+        )
+    news = News.objects.get(pk=1000)
+    assert news.title == 'Импорт'
+    assert news.comment_count == 1
+    comment = news.comment_set.get()
+    assert comment.author == author
+    assert comment.created.isoformat() == '2022-01-02T07:00:00+00:00'
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command(
+            'import_news', str(comments_file), model='comments',
+            create_authors=True
+        )
+    assert News.objects.get(pk=1000).comment_count == 4
+
+
+@pytest.mark.django_db
+def test_import_news_keeps_committed_chunks_counted(
+    tmp_path, author, news, django_capture_on_commit_callbacks
+):
+    comments_file = tmp_path / 'comments.csv'
+    comments_file.write_text(
+        'news_id,author,text,created\n'
+        f'{news.pk},{author.username},Первый,2022-01-02T10:00:00\n'
+        f'{news.pk},{author.username},Второй,2022-01-02T11:00:00\n'
+        f'{news.pk},{author.username},Третий,не дата\n',
+        encoding='utf-8'
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(CommandError, match='после 2 строк'):
+            call_command(
+                'import_news', str(comments_file), model='comments',
+                chunk_size=2, stdout=StringIO()
+            )
+    assert News.objects.get(
+        pk=news.pk
+    ).comment_count == news.comment_count + 2
+
+
+@pytest.mark.django_db
+def test_import_news_reports_broken_csv(tmp_path):
+    news_file = tmp_path / 'news.csv'
+    news_file.write_text(
+        'title,text,date\n'
+        'Первая,Текст,2022-01-02\n'
+        f'Вторая,{"x" * (csv.field_size_limit() + 1)},2022-01-02\n',
+        encoding='utf-8'
+    )
+    with pytest.raises(CommandError, match='Строка 3'):
+        call_command('import_news', str(news_file), stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_index_advisor_finds_no_problems(news_list, comment):
+    out = StringIO()
+    call_command('index_advisor', stdout=out)
+    assert 'Проблем не найдено' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_index_advisor_captures_queries_of_every_page(
+    settings, news_list, comment
+):
+    # Журнал запросов длинного прогона при DEBUG заполнен до предела
+    # и больше не растёт.
+    settings.DEBUG = True
+    connection.queries_log.extend(
+        {'sql': '', 'time': '0'} for _ in range(connection.queries_limit)
+    )
+    command = IndexAdvisor()
+    try:
+        for url_name, budget in settings.QUERY_BUDGETS.items():
+            if ' ' in url_name or not budget['queries']:
+                continue
+            # Второй раз страница уже могла бы прийти из кеша.
+            for _ in range(2):
+                assert command.capture(url_name), url_name
+    finally:
+        reset_queries()
+
+
+@pytest.mark.django_db
+def test_index_advisor_flags_missing_index(settings, news_list):
+    settings.QUERY_BUDGETS = {'news:home': {'queries': 1, 'time_ms': 50}}
+    # Новый LIMIT меняет текст запроса: sqlite3 не возьмёт из кеша
+    # выражений план, построенный до удаления индекса.
+    settings.NEWS_COUNT_ON_HOME_PAGE = 7
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX news_date_idx')
+    out = StringIO()
+    call_command('index_advisor', stdout=out)
+    assert 'news:home: SCAN news_news' in out.getvalue()
+    assert (
+        "News.Meta.indexes: models.Index(fields=('-date',))"
+        in out.getvalue()
+    )
+
+
+def test_index_advisor_suggests_order_by_index():
+    model, index = suggest_index(
+        'news_comment',
+        'SELECT "news_comment"."id" FROM "news_comment" '
+        'WHERE "news_comment"."author_id" = 1 '
+        'ORDER BY "news_comment"."created" DESC LIMIT 10'
+    )
+    assert model is Comment
+    assert index == "models.Index(fields=('author', '-created'))"
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_applied_to_new_connections(settings):
+    settings.SQLITE_PRAGMAS = {'cache_size': -2000, 'busy_timeout': 1234}
+    apply_pragmas(sender=None, connection=connection)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        assert cursor.fetchone() == (-2000,)
+        cursor.execute('PRAGMA busy_timeout')
+        assert cursor.fetchone() == (1234,)
+
+
+def test_replica_router():
+    router = ReplicaRouter()
+    assert router.db_for_read(News) == 'replica'
+    assert router.db_for_read(get_user_model()) == 'replica'
+    assert router.db_for_write(News) == 'default'
+    with primary():
+        assert router.db_for_read(News) == 'default'
+    assert router.db_for_read(News) == 'replica'
+    assert router.db_for_read(Session) == 'default'
+    assert not router.allow_migrate('replica', 'news')
+
+
+@pytest.mark.parametrize(
+    'method, cookies, database, sticky',
+    (
+        ('get', {}, 'replica', False),
+        ('get', {'use_primary': '1'}, 'default', False),
+        ('post', {}, 'default', True),
+    )
+)
+def test_primary_stickiness_middleware(
+    rf, settings, method, cookies, database, sticky
+):
+    databases = []
+
+    def get_response(request):
+        databases.append(ReplicaRouter().db_for_read(News))
+        return HttpResponse()
+
+    request = getattr(rf, method)('/')
+    request.COOKIES.update(cookies)
+    response = PrimaryStickinessMiddleware(get_response)(request)
+    assert databases == [database]
+    assert (settings.REPLICA_STICKY_COOKIE in response.cookies) == sticky
+    assert ReplicaRouter().db_for_read(News) == 'replica'
+
+
+def test_primary_stickiness_middleware_async(rf, settings):
+    databases = []
+
+    async def get_response(request):
+        databases.append(ReplicaRouter().db_for_read(News))
+        return HttpResponse()
+
+    middleware = PrimaryStickinessMiddleware(get_response)
+    assert asyncio.iscoroutinefunction(middleware)
+    response = async_to_sync(middleware)(rf.post('/'))
+    assert databases == ['default']
+    assert settings.REPLICA_STICKY_COOKIE in response.cookies
+    assert ReplicaRouter().db_for_read(News) == 'replica'
+
+
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_sync_replica_command(settings, tmp_path, news):
+    settings.DATABASE_REPLICA = tmp_path / 'replica.sqlite3'
+    call_command('sync_replica', once=True, lag=0, stdout=StringIO())
+    with closing(sqlite3.connect(settings.DATABASE_REPLICA)) as replica:
+        assert replica.execute(
+            'SELECT title FROM news_news ORDER BY id'
+        ).fetchall() == list(News.objects.order_by('pk').values_list('title'))
+    assert list(tmp_path.iterdir()) == [settings.DATABASE_REPLICA]
+
+
+def cached_user(user_id):
+    return cache.get(USER_KEY.format(
+        user_id=user_id, version=get_user_version(user_id)
+    ))
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tmp_path,
+        }
+    }
+
+
+@pytest.fixture(params=('cache', 'signed_cookies'))
+def fast_auth_client(request, settings, shared_cache, author):
+    for name, value in settings.SESSION_PROFILES[request.param].items():
+        setattr(settings, name, value)
+    client = Client()
+    client.force_login(author)
+    return client
+
+
+@pytest.mark.django_db
+def test_fast_auth_path_skips_session_and_user_queries(
+    fast_auth_client, news, home_url, django_assert_num_queries
+):
+    fast_auth_client.get(home_url)
+    with django_assert_num_queries(1):
+        response = fast_auth_client.get(home_url)
+    assert response.context['user'].is_authenticated
+
+
+@pytest.mark.django_db
+def test_fast_auth_path_forgets_user_on_password_change_and_logout(
+    fast_auth_client, author, home_url, django_capture_on_commit_callbacks
+):
+    fast_auth_client.get(home_url)
+    assert cached_user(author.pk) == author
+    with django_capture_on_commit_callbacks(execute=True):
+        author.set_password('new password')
+        author.save()
+    assert cached_user(author.pk) is None
+    assert not fast_auth_client.get(
+        home_url
+    ).context['user'].is_authenticated
+    fast_auth_client.force_login(author)
+    fast_auth_client.get(home_url)
+    fast_auth_client.get(reverse('users:logout'))
+    assert cached_user(author.pk) is None
+
+
+@pytest.mark.django_db
+def test_fast_auth_path_ignores_user_cached_before_change(
+    shared_cache, author, django_capture_on_commit_callbacks
+):
+    backend = CachedModelBackend()
+    # Запрос прочитал версию и пользователя до изменения,
+    # а положил его в кеш уже после.
+    stale_key = USER_KEY.format(
+        user_id=author.pk, version=get_user_version(author.pk)
+    )
+    stale_user = get_user_model().objects.get(pk=author.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        author.is_active = False
+        author.save()
+    cache.add(stale_key, stale_user)
+    assert backend.get_user(author.pk) is None
+    with django_capture_on_commit_callbacks(execute=True):
+        author.is_active = True
+        author.save()
+    assert backend.get_user(author.pk) == author
+    # update() обходит post_save: версию меняет forget_user.
+    get_user_model().objects.filter(pk=author.pk).update(is_active=False)
+    assert backend.get_user(author.pk) == author
+    forget_user(author.pk)
+    assert backend.get_user(author.pk) is None
+
+
+def test_fast_auth_path_refuses_process_local_cache():
+    with pytest.raises(ImproperlyConfigured):
+        CachedModelBackend()
+
+
+@pytest.mark.django_db
+def test_seed_command_is_deterministic_and_skewed():
+    options = {'users': 5, 'news': 20, 'comments': 300, 'batch_size': 7}
+    # Сид рассчитан на пустую базу.
+    News.objects.all().delete()
+    call_command('seed', seed=1, stdout=StringIO(), **options)
+    counts = list(
+        News.objects.order_by('pk').values_list('comment_count', flat=True)
+    )
+    assert sum(counts) == Comment.objects.count() == 300
+    assert counts[0] == max(counts) > 300 / 20 * 3
+    assert News.objects.recount_comments() == 0
+    fields = ('news', 'author', 'text', 'created')
+    comments = list(Comment.objects.order_by('pk').values_list(*fields))
+    News.objects.all().delete()
+    get_user_model().objects.filter(username__startswith='seed1_').delete()
+    call_command('seed', seed=1, stdout=StringIO(), **options)
+    assert list(
+        Comment.objects.order_by('pk').values_list(*fields)
+    ) == comments
+
+
+@pytest.mark.django_db
+def test_moderation_worker_approves_and_rejects(news, author):
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=text)
+        for text in ('Обычный текст', 'ААААААААААААААААААААААА!', 'Ещё один')
+    )
+    assert moderate(batch_size=2) == {
+        Comment.Status.APPROVED: 1, Comment.Status.REJECTED: 1
+    }
+    assert moderate(batch_size=2) == {Comment.Status.APPROVED: 1}
+    assert moderate(batch_size=2) == {}
+    assert News.objects.get(
+        pk=news.pk
+    ).comment_count == news.comment_count + 2
+
+
+@pytest.mark.django_db
+def test_unapproved_comments_visible_only_to_author(
+    client, author_client, admin_client, comment, detail_url
+):
+    Comment.objects.filter(pk=comment.pk).update(
+        status=Comment.Status.PENDING
+    )
+    for other_client in (client, admin_client):
+        context = other_client.get(detail_url).context
+        assert comment.pk not in [
+            shown['pk'] for shown in context['comments']
+        ]
+        assert not context.get('own_unapproved')
+    own = author_client.get(detail_url).context['own_unapproved']
+    assert [own_comment.pk for own_comment in own] == [comment.pk]
+    assert client.get(
+        reverse('news:search'), {'q': comment.text}
+    ).context['comment_results'] == []
+
+
+@pytest.mark.django_db
+def test_admin_news_pages_do_not_render_comments(admin_client, news, comment):
+    Comment.objects.create(news=news, author=comment.author, text='Новый')
+    news_list = admin_client.get(
+        reverse('admin:news_news_changelist')
+    ).context['cl'].result_list
+    pending = {item.pk: item.pending_count for item in news_list}
+    assert pending.pop(news.pk) == 1
+    assert set(pending.values()) == {0}
+    response = admin_client.get(
+        reverse('admin:news_news_change', args=(news.pk,))
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert 'comment_set' not in response.content.decode()
+    assert admin_client.get(
+        reverse('admin:news_comment_changelist'),
+        {'news__id__exact': news.pk, 'q': comment.text},
+    ).context['cl'].result_count == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', (2, 10))
+def test_admin_comment_actions_are_set_based(
+    admin_client, author, size, django_assert_max_num_queries
+):
+    news = News.objects.create(title='Без комментариев', text='Текст')
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for index in range(size)
+    )
+    url = reverse('admin:news_comment_changelist')
+    selected = list(news.comment_set.values_list('pk', flat=True))
+    with django_assert_max_num_queries(8):
+        admin_client.post(url, {
+            'action': 'approve', '_selected_action': selected,
+        })
+    assert News.objects.get(pk=news.pk).comment_count == size
+    data = {'action': 'delete_set', '_selected_action': selected[1:]}
+    response = admin_client.post(url, data)
+    assert f'Удалить выбранные комментарии: {size - 1}?' in (
+        response.content.decode()
+    )
+    assert news.comment_set.count() == size
+    with django_assert_max_num_queries(12):
+        admin_client.post(url, {**data, 'post': 'yes'})
+    assert list(
+        news.comment_set.values_list('pk', flat=True)
+    ) == selected[:1]
+    assert News.objects.get(pk=news.pk).comment_count == 1
+    assert sorted(LogEntry.objects.filter(
+        action_flag=DELETION
+    ).values_list('object_id', flat=True)) == sorted(
+        str(pk) for pk in selected[1:]
+    )
+
+
+@pytest.mark.django_db
+def test_admin_delete_set_across_all_pages(
+    monkeypatch, admin_client, news, comments_list
+):
+    monkeypatch.setattr(moderation, 'DELETE_BATCH_SIZE', 3)
+    url = reverse('admin:news_comment_changelist')
+    data = {
+        'action': 'delete_set', 'select_across': '1', 'index': '0',
+        '_selected_action': [Comment.objects.first().pk],
+    }
+    response = admin_client.post(url, data)
+    assert response.context['count'] == Comment.objects.count() > 1
+    del data['index']
+    admin_client.post(url, {**data, 'post': 'yes'})
+    assert not Comment.objects.exists()
+    assert LogEntry.objects.filter(action_flag=DELETION).count() == (
+        response.context['count']
+    )
+    assert News.objects.get(pk=news.pk).comment_count == 0
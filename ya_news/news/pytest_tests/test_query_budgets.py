@@ -0,0 +1,85 @@
+import pytest
+from django.urls import reverse
+
+from yanews.query_budget import QueryTimeWarning
+
+ANONYMOUS = pytest.lazy_fixture('client')
+AUTHOR_CLIENT = pytest.lazy_fixture('author_client')
+COMMENT_FORM_DATA = {'text': 'Pro100Text'}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url_name, custom_client',
+    (
+        ('news:home', ANONYMOUS),
+        ('news:detail', ANONYMOUS),
+        ('news:detail', AUTHOR_CLIENT),
+        ('news:api_list', ANONYMOUS),
+        ('news:api_detail', ANONYMOUS),
+        ('users:login', ANONYMOUS),
+        ('users:signup', ANONYMOUS),
+    )
+)
+def test_pages_within_query_budget(
+    url_name, custom_client, query_budget, news_list, comments_list, news
+):
+    args = (news.pk,) if url_name.endswith('detail') else ()
+    with query_budget(url_name):
+        custom_client.get(reverse(url_name, args=args))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url_name, method, data',
+    (
+        ('news:edit', 'GET', None),
+        ('news:edit', 'POST', COMMENT_FORM_DATA),
+        ('news:delete', 'GET', None),
+        ('news:delete', 'POST', None),
+    )
+)
+def test_comment_pages_within_query_budget(
+    url_name, method, data, query_budget, author_client, comment
+):
+    url = reverse(url_name, args=(comment.pk,))
+    with query_budget(url_name, method):
+        if method == 'GET':
+            author_client.get(url)
+        else:
+            author_client.post(url, data=data)
+
+
+@pytest.mark.django_db
+def test_comment_post_within_query_budget(
+    query_budget, author_client, detail_url
+):
+    with query_budget('news:detail', 'POST'):
+        author_client.post(detail_url, data=COMMENT_FORM_DATA)
+
+
+@pytest.mark.django_db
+def test_search_within_query_budget(query_budget, client, news_list):
+    with query_budget('news:search'):
+        client.get(reverse('news:search'), {'q': 'новость'})
+
+
+@pytest.mark.django_db
+def test_query_budget_lists_offending_sql(query_budget, client, home_url):
+    with pytest.raises(AssertionError, match='news_news'):
+        with query_budget('users:login'):
+            client.get(home_url)
+
+
+@pytest.mark.django_db
+def test_query_budget_time_is_a_warning_unless_strict(
+    settings, query_budget, client, home_url
+):
+    settings.QUERY_BUDGETS = {'news:home': {'queries': 1, 'time_ms': -1}}
+    with pytest.warns(QueryTimeWarning, match='-1 мс'):
+        with query_budget('news:home'):
+            client.get(home_url)
+    settings.QUERY_BUDGET_STRICT_TIME = True
+    with pytest.raises(AssertionError, match='-1 мс'):
+        with query_budget('news:home'):
+            client.get(home_url)
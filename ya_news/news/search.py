@@ -0,0 +1,78 @@
+"""
+Полнотекстовый поиск по индексам SQLite FTS5.
+
+Индексы news_news_fts и news_comment_fts создаются миграцией 0006
+и поддерживаются триггерами на таблицах новостей и комментариев.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+NEWS_INDEX = 'news_news_fts'
+COMMENTS_INDEX = 'news_comment_fts'
+WORD = re.compile(r'\w+')
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+def build_match(query):
+    """
+    Превращает ввод пользователя в выражение MATCH для FTS5.
+
+    Каждое слово ищется по префиксу и берётся в кавычки, поэтому
+    операторы и спецсимволы FTS5 из запроса не интерпретируются.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и размечает найденные слова тегом mark."""
+    return mark_safe(
+        escape(snippet).replace(
+            HIGHLIGHT_START, '<mark>'
+        ).replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def search(queryset, index, query, column, weights):
+    """
+    Ограничивает queryset документами индекса, подходящими под запрос.
+
+    Результаты упорядочены по BM25 с весами колонок weights, у каждого
+    объекта есть атрибут snippet с фрагментом колонки column.
+    """
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        select={
+            'snippet': (
+                f"snippet({index}, {column}, char(2), char(3), '…', 16)"
+            ),
+            'search_rank': f'bm25({index}, {weights})',
+        },
+        tables=[index],
+        where=[f'{index}.rowid = {table}.id', f'{index} MATCH %s'],
+        params=[match],
+        order_by=['search_rank'],
+    )
+
+
+def highlighted(queryset):
+    """Выполняет поиск и размечает фрагменты у найденных объектов."""
+    objects = list(queryset)
+    for obj in objects:
+        obj.snippet = highlight(obj.snippet)
+    return objects
+
+
+def rebuild(index):
+    """Перестраивает индекс по таблице-источнику и возвращает число строк."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {index}')
+        return cursor.fetchone()[0]
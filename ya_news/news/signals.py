@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_news_version
+from .models import Comment, News
+
+
+APPROVED = Comment.Status.APPROVED
+
+_bulk_delete = ContextVar('bulk_comment_delete', default=False)
+
+
+@contextmanager
+def bulk_comment_delete():
+    """
+    Удаление комментариев без пересчёта новости на каждый из них.
+
+    Вызывающий сам пересчитывает счётчики и версии затронутых
+    новостей после фиксации (см. moderation.refresh_news).
+    """
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_count(sender, instance, created, raw=False, **kwargs):
+    """
+    Счётчик новости учитывает только одобренные комментарии.
+
+    Он меняется, когда комментарий становится одобренным или
+    перестаёт им быть, например после правки текста.
+    """
+    was_approved = not created and getattr(
+        instance, '_loaded_status', None
+    ) == APPROVED
+    is_approved = instance.status == APPROVED
+    instance._loaded_status = instance.status
+    if raw or was_approved == is_approved:
+        return
+    News.objects.filter(pk=instance.news_id).update(
+        comment_count=F('comment_count') + (1 if is_approved else -1)
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comment_count(sender, instance, **kwargs):
+    """
+    Удалённый одобренный комментарий уменьшает счётчик новости.
+
+    Сигнал приходит и при удалении через QuerySet.delete(),
+    и при каскадном удалении вместе с новостью.
+    """
+    if _bulk_delete.get() or instance.status != APPROVED:
+        return
+    News.objects.filter(
+        pk=instance.news_id, comment_count__gt=0
+    ).update(comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_version_on_comment_change(sender, instance, **kwargs):
+    """Любое изменение комментария меняет версию его новости."""
+    if not _bulk_delete.get():
+        bump_news_version(instance.news_id)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def bump_version_on_news_change(sender, instance, **kwargs):
+    bump_news_version(instance.pk)
@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
 
 from news import views
 
 app_name = 'news'
 
+if settings.NEWS_ASYNC_VIEWS:
+    home_view = views.async_news_list
+    detail_view = views.async_news_detail
+else:
+    home_view = views.news_list_view
+    detail_view = views.news_detail_view
+
 urlpatterns = [
-    path('', views.NewsList.as_view(), name='home'),
-    path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('', home_view, name='home'),
+    path('news/<int:pk>/', detail_view, name='detail'),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
         name='delete'
     ),
     path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path('api/news/', views.NewsApiList.as_view(), name='api_list'),
+    path(
+        'api/news/<int:pk>/',
+        views.NewsApiDetail.as_view(),
+        name='api_detail'
+    ),
+    path('api/export/', views.NewsApiExport.as_view(), name='api_export'),
 ]
@@ -1,13 +1,63 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .cache import get_comments_block, get_news_list_version, get_news_version
 from .forms import CommentForm
 from .models import Comment, News
+from .pagination import keyset_page
+from .search import COMMENTS_INDEX, NEWS_INDEX, highlighted, search
+
+NEWS_API_FIELDS = ('id', 'title', 'text', 'date', 'comment_count')
+COMMENT_API_FIELDS = ('id', 'news_id', 'author__username', 'text', 'created')
+
+
+def news_list_etag(request, *args, **kwargs):
+    """
+    Валидатор ETag главной: версия списка новостей и пользователь.
+
+    Версии хранятся в кеше, так что проверка не обращается к БД.
+    """
+    return f'{get_news_list_version()}-{request.user.pk}'
+
+
+def news_detail_etag(request, *args, **kwargs):
+    """
+    Валидатор ETag страницы новости: версия новости и пользователь.
+
+    Авторизованному пользователю страница выводит форму с CSRF-токеном,
+    а вход в систему меняет токен, поэтому в ETag входит и он: иначе
+    после повторного входа браузер получил бы 304 и отправил форму
+    со старым токеном. get_token заводит токен до рендеринга, чтобы
+    ETag первого ответа совпал со следующими.
+    """
+    etag = (
+        f'{kwargs["pk"]}-{get_news_version(kwargs["pk"])}-{request.user.pk}'
+    )
+    if request.user.is_authenticated:
+        get_token(request)
+        etag += '-' + hashlib.md5(
+            request.META['CSRF_COOKIE'].encode()
+        ).hexdigest()[:12]
+    return etag
 
 
+@method_decorator(condition(etag_func=news_list_etag), name='dispatch')
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
@@ -18,22 +68,39 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Число комментариев берётся из денормализованного счётчика.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
 
-class NewsDetail(generic.DetailView):
+class CommentsBlockMixin:
+    """
+    Добавляет в контекст закешированную страницу комментариев.
+
+    Страница задаётся курсором из GET-параметра after. Свои ещё не
+    одобренные комментарии пользователь видит отдельным списком:
+    в общий кеш они не попадают.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'], context['next_cursor'] = get_comments_block(
+            self.object, self.request.GET.get('after', '')
+        )
+        if self.request.user.is_authenticated:
+            context['own_unapproved'] = Comment.objects.unapproved().filter(
+                news=self.object, author=self.request.user
+            ).select_related('author').order_by('created', 'pk')
+        return context
+
+
+@method_decorator(condition(etag_func=news_detail_etag), name='dispatch')
+class NewsDetail(CommentsBlockMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -44,6 +111,7 @@ class NewsDetail(generic.DetailView):
 
 class NewsComment(
         LoginRequiredMixin,
+        CommentsBlockMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -63,8 +131,9 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -78,19 +147,94 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.NEWS_ASYNC_DB_THREADS,
+    thread_name_prefix='news-db',
+)
+
+
+def render_sync_view(view, request, *args, **kwargs):
+    """
+    Выполняет синхронное представление вместе с рендерингом шаблона.
+
+    Вызывается в потоке db_executor; по завершении закрывает
+    соединения этого потока по тем же правилам, что и WSGI-обработчик.
+    """
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_executor(view, request, *args, **kwargs):
+    """
+    Запускает представление в отдельном ограниченном пуле потоков.
+
+    Пока ORM и шаблоны работают в пуле, цикл событий свободен,
+    а число одновременных соединений с БД не больше размера пула.
+    Поток пула получает копию контекста запроса: в нём, например,
+    отмечено, что запрос читает из основной БД, а не из реплики.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        db_executor,
+        partial(
+            context.run, render_sync_view, view, request, *args, **kwargs
+        )
+    )
+
+
+news_list_view = NewsList.as_view()
+news_detail_view = NewsDetailView.as_view()
+
+
+async def async_news_list(request):
+    """Асинхронный вариант NewsList для ASGI."""
+    return await run_in_db_executor(news_list_view, request)
+
+
+async def async_news_detail(request, pk):
+    """Асинхронный вариант NewsDetailView для ASGI."""
+    return await run_in_db_executor(news_detail_view, request, pk=pk)
+
+
+class NewsSearch(generic.TemplateView):
+    """Поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '')
+        limit = settings.SEARCH_RESULTS_COUNT
+        context['query'] = query
+        context['news_results'] = highlighted(search(
+            News.objects.only('title', 'date'),
+            NEWS_INDEX, query, column=1, weights='10.0, 1.0',
+        )[:limit])
+        context['comment_results'] = highlighted(search(
+            Comment.objects.approved().only('news_id'),
+            COMMENTS_INDEX, query, column=0, weights='1.0',
+        )[:limit])
+        return context
+
+
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -98,7 +242,101 @@ class CommentUpdate(CommentBase, generic.UpdateView):
     template_name = 'news/edit.html'
     form_class = CommentForm
 
+    def form_valid(self, form):
+        """Изменённый текст снова проходит модерацию."""
+        if 'text' in form.changed_data:
+            form.instance.status = Comment.Status.PENDING
+        return super().form_valid(form)
+
 
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+
+class NewsApiList(generic.View):
+    """Последние новости в JSON."""
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'results': list(
+            News.objects.values(
+                *NEWS_API_FIELDS
+            )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        )})
+
+
+class NewsApiDetail(generic.View):
+    """Новость в JSON со страницей комментариев, как на news:detail."""
+
+    def get(self, request, *args, **kwargs):
+        news = get_object_or_404(
+            News.objects.values(*NEWS_API_FIELDS), pk=kwargs['pk']
+        )
+        comments, next_cursor = keyset_page(
+            Comment.objects.approved().filter(
+                news_id=news['id']
+            ).select_related('author').only(
+                'news_id', 'text', 'created', 'author__username'
+            ),
+            request.GET.get('after', ''),
+            settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+        )
+        news['comments'] = [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in comments
+        ]
+        news['next_cursor'] = next_cursor
+        return JsonResponse(news)
+
+
+class NewsApiExport(LoginRequiredMixin, generic.View):
+    """
+    Выгрузка всех новостей и одобренных комментариев в NDJSON.
+
+    Доступна только вошедшим пользователям. Строки читаются через
+    values() порциями по NEWS_EXPORT_CHUNK_SIZE и сразу отдаются
+    клиенту, поэтому память процесса не растёт вместе с таблицей
+    комментариев. Каждая порция - отдельный короткий запрос по
+    условию pk > последнего: открытый на всю выгрузку курсор держал
+    бы блокировку чтения SQLite.
+    """
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            self.stream(), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="news.ndjson"'
+        )
+        return response
+
+    def stream(self):
+        chunk_size = settings.NEWS_EXPORT_CHUNK_SIZE
+        for model, queryset in (
+            ('news', News.objects.values(*NEWS_API_FIELDS)),
+            (
+                'comment',
+                Comment.objects.approved().values(*COMMENT_API_FIELDS)
+            ),
+        ):
+            last_pk = 0
+            while True:
+                rows = list(
+                    queryset.filter(pk__gt=last_pk).order_by('pk')[
+                        :chunk_size
+                    ]
+                )
+                for row in rows:
+                    row['model'] = model
+                    yield json.dumps(
+                        row, cls=DjangoJSONEncoder, ensure_ascii=False
+                    ) + '\n'
+                if len(rows) < chunk_size:
+                    break
+                last_pk = rows[-1]['id']
@@ -0,0 +1,91 @@
+"""
+Быстрый путь аутентификации: пользователь сессии берётся из кеша.
+
+Бэкенд включается профилем сессий (см. SESSION_PROFILES в настройках),
+приёмники подключаются в AppConfig.ready() приложения проекта.
+"""
+import time
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+USER_KEY = 'auth:user:{user_id}:{version}'
+USER_VERSION_KEY = 'auth:user:{user_id}:version'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который загружает пользователя сессии через кеш.
+
+    Хеш пароля кешируется вместе с пользователем, поэтому проверка
+    сессии после смены пароля работает как обычно: смена пароля
+    сохраняет пользователя и меняет его версию в кеше. Версия
+    читается до загрузки из БД, а меняется после фиксации транзакции,
+    поэтому запрос, прочитавший пользователя до изменения, положит
+    его под старую версию, которую уже никто не спросит. Новую версию
+    должны увидеть все процессы сервера, поэтому кеш в памяти процесса
+    не подходит.
+
+    QuerySet.update() не шлёт post_save: после массового изменения
+    пользователей (например, is_active=False) вызовите forget_user,
+    иначе прежние данные проживут до AUTH_USER_CACHE_TIMEOUT.
+    """
+
+    def __init__(self):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            raise ImproperlyConfigured(
+                'Кешу пользователей нужен кеш, общий для всех процессов: '
+                'задайте CACHE_PROFILE.'
+            )
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(
+            user_id=user_id, version=get_user_version(user_id)
+        )
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.add(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def get_user_version(user_id):
+    """Версия пользователя; пропавшая из кеша заводится от времени."""
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def forget_user(user_id):
+    """Меняет версию пользователя: закешированная копия устаревает."""
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_changed_user(sender, instance, **kwargs):
+    """Сохранение (в том числе смена пароля) и удаление сбрасывают кеш."""
+    transaction.on_commit(partial(forget_user, instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
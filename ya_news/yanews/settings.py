@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -28,6 +29,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yanews.ratelimit.RateLimitMiddleware',
+    'news.page_cache.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yanews.urls'
@@ -58,6 +61,101 @@ DATABASES = {
     }
 }
 
+# Профиль БД: development или production. Производственный профиль
+# включает WAL, настраивает SQLite прагмами на каждом новом соединении
+# (см. yanews/sqlite.py) и держит соединения открытыми между запросами.
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {}
+
+SQLITE_HEALTH_CHECK_INTERVAL = 30
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        # Отрицательное значение задаёт размер кеша в килобайтах.
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+
+# Реплика для чтения: путь к копии основной БД, которую обновляет
+# manage.py sync_replica. Клиент, изменивший данные, ещё
+# REPLICA_STICKY_SECONDS читает из основной БД (см. yanews/replica.py);
+# это время должно быть больше отставания реплики.
+DATABASE_REPLICA = os.getenv('DATABASE_REPLICA')
+REPLICA_STICKY_COOKIE = 'use_primary'
+REPLICA_STICKY_SECONDS = 10
+
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Реплика открывается только для чтения.
+        'NAME': f'file:{DATABASE_REPLICA}?mode=ro',
+        'CONN_MAX_AGE': DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['yanews.replica.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'yanews.replica.PrimaryStickinessMiddleware')
+
+
+# Кеш, общий для всех процессов сервера: в нём лежат версии и готовые
+# фрагменты страниц, пользователи и счётчики лимитов, и каждый процесс
+# должен сразу видеть чужую инвалидацию. file - каталог на диске
+# (CACHE_LOCATION, по умолчанию .cache рядом с БД), memcached - сервер
+# memcached по адресу CACHE_LOCATION. У файлового кеша incr и add не
+# атомарны между процессами: инвалидация от этого не страдает, а
+# лимиты частоты с ним выключены (см. RATE_LIMITS), поэтому
+# в производстве лучше memcached.
+CACHE_PROFILE = os.getenv('CACHE_PROFILE', 'file')
+CACHE_PROFILES = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / '.cache'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+}
+CACHES = {'default': CACHE_PROFILES[CACHE_PROFILE]}
+
+
+# Профиль сессий. database - сессии в БД, как по умолчанию в Django.
+# cache и signed_cookies - быстрый путь для авторизованных запросов:
+# сессия читается из кеша (cached_db) или из подписанной cookie,
+# а пользователь - из кеша (см. yanews/auth.py), поэтому им нужен
+# общий кеш CACHE_PROFILE, а не кеш в памяти процесса. Подписанную
+# cookie нельзя отозвать на сервере до истечения срока сессии.
+SESSION_PROFILES = {
+    'database': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': [
+            'django.contrib.auth.backends.ModelBackend'
+        ],
+    },
+    'cache': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['yanews.auth.CachedModelBackend'],
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'AUTHENTICATION_BACKENDS': ['yanews.auth.CachedModelBackend'],
+    },
+}
+SESSION_PROFILE = os.getenv('SESSION_PROFILE', 'database')
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]['SESSION_ENGINE']
+AUTHENTICATION_BACKENDS = SESSION_PROFILES[SESSION_PROFILE][
+    'AUTHENTICATION_BACKENDS'
+]
+AUTH_USER_CACHE_TIMEOUT = 60 * 60
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +178,62 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+# Файл со словарём запрещённых слов модераторов, по слову в строке.
+BAD_WORDS_FILE = os.getenv('BAD_WORDS_FILE')
+BAD_WORDS_RELOAD_INTERVAL = 5
+
+# Новый комментарий ждёт модерации воркером moderate_comments;
+# в запросе проверяются только стоп-слова.
+COMMENT_MODERATION_BATCH_SIZE = 500
+COMMENT_MODERATION_INTERVAL = 1
+COMMENT_MAX_LINKS = 2
+
+NEWS_EXPORT_CHUNK_SIZE = 2000
+
+SEARCH_RESULTS_COUNT = 20
+
+# Асинхронные NewsList и NewsDetail для запуска под ASGI. Работа с БД
+# и шаблонами выполняется в отдельном пуле из NEWS_ASYNC_DB_THREADS
+# потоков.
+NEWS_ASYNC_VIEWS = os.getenv('NEWS_ASYNC_VIEWS') == '1'
+NEWS_ASYNC_DB_THREADS = 8
+
+NEWS_COMMENTS_CACHE_TIMEOUT = 60 * 60
+
+# Кеш целых страниц для анонимных GET, см. news/page_cache.py.
+# Пока страницу перестраивает другой запрос, остальные ждут не дольше
+# PAGE_CACHE_WAIT секунд, если прежней версии страницы нет.
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_WAIT = 2
+
+# Лимиты изменяющих запросов по имени URL: не больше requests за
+# period секунд на пользователя или IP, см. yanews/ratelimit.py.
+# Счётчикам нужен атомарный incr, поэтому лимиты включены только
+# с кешем memcached.
+RATE_LIMITS = {
+    'news:detail': {'requests': 10, 'period': 60},
+    'users:signup': {'requests': 5, 'period': 60 * 60},
+} if CACHE_PROFILE == 'memcached' else {}
+
+# Бюджеты запросов к БД на страницу: число запросов и время в мс.
+# Проверяются тестами, см. yanews/query_budget.py. Превышение времени
+# - предупреждение, а при QUERY_BUDGET_STRICT_TIME=1 - ошибка.
+QUERY_BUDGET_STRICT_TIME = os.getenv('QUERY_BUDGET_STRICT_TIME') == '1'
+QUERY_BUDGETS = {
+    'news:home': {'queries': 1, 'time_ms': 50},
+    'news:detail': {'queries': 5, 'time_ms': 50},
+    'news:search': {'queries': 2, 'time_ms': 50},
+    'news:api_list': {'queries': 1, 'time_ms': 50},
+    'news:api_detail': {'queries': 2, 'time_ms': 50},
+    'POST news:detail': {'queries': 5, 'time_ms': 50},
+    'news:edit': {'queries': 3, 'time_ms': 50},
+    'POST news:edit': {'queries': 5, 'time_ms': 50},
+    'news:delete': {'queries': 3, 'time_ms': 50},
+    'POST news:delete': {'queries': 5, 'time_ms': 50},
+    'users:login': {'queries': 0, 'time_ms': 0},
+    'users:signup': {'queries': 0, 'time_ms': 0},
+}
@@ -0,0 +1,49 @@
+"""
+Настройка соединений SQLite для производственного профиля БД.
+
+Приёмники подключаются в AppConfig.ready() приложения проекта.
+"""
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на каждом новом соединении SQLite."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    connection.health_checked_at = time.monotonic()
+
+
+@receiver(request_started)
+def check_persistent_connections(**kwargs):
+    """
+    Проверяет постоянные соединения перед запросом.
+
+    Не чаще раза в SQLITE_HEALTH_CHECK_INTERVAL секунд на соединение
+    выполняется SELECT 1; соединение, которое его не пережило,
+    закрывается, и Django откроет новое при первом запросе к БД.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if (
+            connection.connection is None
+            or not connection.settings_dict['CONN_MAX_AGE']
+            or now - getattr(connection, 'health_checked_at', now)
+            < settings.SQLITE_HEALTH_CHECK_INTERVAL
+        ):
+            continue
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            connection.close()
+        connection.health_checked_at = now
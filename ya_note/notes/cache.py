@@ -0,0 +1,109 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from yanote.replica import primary
+
+from .pagination import decode_cursor
+
+NOTES_VERSION_KEY = 'notes:{user_id}:version'
+NOTES_PAGE_KEY = 'notes:{user_id}:{version}:list:{cursor}'
+NOTE_KEY = 'notes:{user_id}:{version}:note:{slug}'
+NOTES_CACHE_STATS_KEY = 'notes:cache:{outcome}'
+
+
+def get_version(key):
+    """
+    Возвращает текущую версию по ключу.
+
+    Если версии в кеше нет (первое обращение или вытеснение),
+    она заводится заново от текущего времени, чтобы не совпасть
+    ни с одной из уже выданных.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Атомарно увеличивает версию по ключу."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+def get_notes_version(user_id):
+    return get_version(NOTES_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_notes_version(user_id):
+    """Отмечает изменение заметок пользователя."""
+    bump_version(NOTES_VERSION_KEY.format(user_id=user_id))
+
+
+def count(outcome):
+    """Увеличивает счётчик попаданий или промахов кеша заметок."""
+    key = NOTES_CACHE_STATS_KEY.format(outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_cache_stats():
+    """Счётчики кеша заметок: попадания и промахи."""
+    return {
+        outcome: cache.get(NOTES_CACHE_STATS_KEY.format(outcome=outcome), 0)
+        for outcome in ('hits', 'misses')
+    }
+
+
+def get_or_build(key, build):
+    """
+    Значение из кеша заметок или результат build(), сохранённый в кеш.
+
+    Ключи содержат id пользователя и версию его заметок, поэтому
+    после изменения заметок прежние записи просто не читаются,
+    а чужие записи не могут совпасть по ключу. Версия меняется сразу
+    после записи, а реплика БД отстаёт, поэтому значение строится
+    по основной БД.
+    """
+    value = cache.get(key)
+    if value is not None:
+        count('hits')
+        return value
+    count('misses')
+    with primary():
+        value = build()
+    cache.set(key, value, settings.NOTES_CACHE_TIMEOUT)
+    return value
+
+
+def get_notes_page(user_id, cursor, build):
+    """Страница списка заметок пользователя после курсора."""
+    cursor = decode_cursor(cursor)
+    if cursor is None:
+        cursor = ''
+    return get_or_build(
+        NOTES_PAGE_KEY.format(
+            user_id=user_id,
+            version=get_notes_version(user_id),
+            cursor=cursor,
+        ),
+        lambda: build(cursor),
+    )
+
+
+def get_note(user_id, slug, build):
+    """Заметка пользователя по slug."""
+    return get_or_build(
+        NOTE_KEY.format(
+            user_id=user_id, version=get_notes_version(user_id), slug=slug
+        ),
+        build,
+    )
@@ -0,0 +1,136 @@
+"""
+Потоковая выгрузка заметок в ZIP.
+
+zipfile держит описание каждого файла архива в памяти до записи
+центрального каталога в конце, то есть память растёт с числом
+заметок. Здесь каждый файл сжимается и сразу отдаётся клиенту,
+а записи центрального каталога копятся во временном файле, который
+держит в памяти не больше NOTES_EXPORT_SPOOL_SIZE байт. Архивы
+больше 65535 файлов или 4 ГБ получают записи ZIP64.
+"""
+import struct
+import tempfile
+import time
+import zlib
+
+from django.conf import settings
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_OFFSET = struct.Struct('<HHQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END = struct.Struct('<IHHHHIIH')
+
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+ZIP64_END_SIGNATURE = 0x06064B50
+ZIP64_LOCATOR_SIGNATURE = 0x07064B50
+END_SIGNATURE = 0x06054B50
+# Версия формата 4.5 - первая с ZIP64.
+VERSION = 45
+DEFLATED = 8
+UTF8_NAMES = 0x800
+MAX_16 = 0xFFFF
+MAX_32 = 0xFFFFFFFF
+SPOOL_READ_SIZE = 64 * 1024
+
+
+def dos_datetime(moment):
+    """Время и дата в формате MS-DOS, как их хранит ZIP."""
+    return (
+        moment.tm_hour << 11 | moment.tm_min << 5 | moment.tm_sec // 2,
+        (moment.tm_year - 1980) << 9 | moment.tm_mon << 5 | moment.tm_mday,
+    )
+
+
+class ZipWriter:
+    """
+    ZIP-архив, который пишется по одному файлу.
+
+    add() возвращает байты очередного файла, close() - центральный
+    каталог и конец архива. В памяти живёт только текущий файл.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.count = 0
+        self.central = tempfile.SpooledTemporaryFile(
+            max_size=settings.NOTES_EXPORT_SPOOL_SIZE
+        )
+        self.time, self.date = dos_datetime(time.localtime())
+
+    def add(self, name, data):
+        name = name.encode()
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        header = LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, VERSION, UTF8_NAMES, DEFLATED,
+            self.time, self.date, crc, len(compressed), len(data),
+            len(name), 0,
+        )
+        extra = b''
+        if self.offset >= MAX_32:
+            extra = ZIP64_OFFSET.pack(1, 8, self.offset)
+        self.central.write(CENTRAL_HEADER.pack(
+            CENTRAL_HEADER_SIGNATURE, VERSION, VERSION, UTF8_NAMES,
+            DEFLATED, self.time, self.date, crc, len(compressed),
+            len(data), len(name), len(extra), 0, 0, 0, 0,
+            min(self.offset, MAX_32),
+        ) + name + extra)
+        self.offset += len(header) + len(name) + len(compressed)
+        self.count += 1
+        return header + name + compressed
+
+    def close(self):
+        """Отдаёт центральный каталог и конец архива."""
+        central_size = self.central.tell()
+        self.central.seek(0)
+        while True:
+            block = self.central.read(SPOOL_READ_SIZE)
+            if not block:
+                break
+            yield block
+        central_end = self.offset + central_size
+        if (
+            self.count >= MAX_16
+            or self.offset >= MAX_32
+            or central_size >= MAX_32
+        ):
+            yield ZIP64_END.pack(
+                ZIP64_END_SIGNATURE, ZIP64_END.size - 12, VERSION,
+                VERSION, 0, 0, self.count, self.count, central_size,
+                self.offset,
+            ) + ZIP64_LOCATOR.pack(
+                ZIP64_LOCATOR_SIGNATURE, 0, central_end, 1
+            )
+        yield END.pack(
+            END_SIGNATURE, 0, 0, min(self.count, MAX_16),
+            min(self.count, MAX_16), min(central_size, MAX_32),
+            min(self.offset, MAX_32), 0,
+        )
+
+
+def stream_zip(files):
+    """
+    Архив из пар (имя, байты) частями около NOTES_EXPORT_BUFFER_SIZE.
+
+    Мелкие файлы копятся в буфере, чтобы не отдавать серверу
+    по записи на заметку.
+    """
+    writer = ZipWriter()
+    try:
+        buffer = bytearray()
+        for name, data in files:
+            buffer += writer.add(name, data)
+            if len(buffer) >= settings.NOTES_EXPORT_BUFFER_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+        yield from writer.close()
+    finally:
+        writer.central.close()
@@ -1,6 +1,7 @@
 from pytils.translit import slugify
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from .models import Note
@@ -27,3 +28,30 @@ class NoteForm(forms.ModelForm):
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        """
+        Повторно уникальность не проверяем.
+
+        Единственное уникальное поле, slug, уже проверено в clean_slug,
+        а стандартная проверка ModelForm сделала бы тот же запрос ещё раз.
+        """
+
+
+class NoteImportForm(forms.Form):
+    """Форма загрузки файла с заметками."""
+
+    file = forms.FileField(
+        label='Файл',
+        help_text='JSONL или CSV с полями title, text и slug (необязательно)'
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if upload.size > settings.NOTES_IMPORT_MAX_SIZE:
+            raise ValidationError(
+                'Файл больше '
+                f'{settings.NOTES_IMPORT_MAX_SIZE // 1024} КБ, загрузите '
+                'его частями.'
+            )
+        return upload
@@ -0,0 +1,57 @@
+import csv
+from pathlib import Path
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from notes.importer import import_notes, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует заметки пользователя из JSONL или CSV с полями '
+        'title, text и необязательным slug. Занятые slug получают '
+        'суффиксы -2, -3, ...'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--author', required=True, help='username.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='По умолчанию определяется по расширению файла.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Заметок в одном bulk_create.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or (
+            'csv' if path.suffix.lower() == '.csv' else 'jsonl'
+        )
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["author"]}')
+        started = perf_counter()
+        try:
+            with open(path, encoding='utf-8', newline='') as source:
+                imported = import_notes(
+                    author,
+                    read_rows(source, file_format),
+                    options['batch_size'],
+                )
+        except (
+            OSError, ValueError, KeyError, csv.Error, DatabaseError
+        ) as error:
+            raise CommandError(f'Импорт не выполнен: {error!r}')
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано заметок: {imported} за {elapsed:.1f} с'
+        ))
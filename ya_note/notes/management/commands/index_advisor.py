@@ -0,0 +1,169 @@
+import re
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+WHERE_COLUMN = re.compile(r'"(\w+)"\."(\w+)" (?:=|IN|>|<|>=|<=) ')
+ORDER_BY = re.compile(r' ORDER BY (.+?)(?: LIMIT | OFFSET |$)')
+ORDER_COLUMN = re.compile(r'"(\w+)"\."(\w+)"( DESC)?')
+# Страница или её часть из кеша не выполнила бы ни одного запроса.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def get_model_fields(table):
+    """Модель и словарь «колонка — поле» для таблицы проекта."""
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model, {
+                field.column: field.name for field in model._meta.fields
+            }
+    return None, {}
+
+
+def suggest_index(table, sql):
+    """
+    Предлагает Meta.indexes для таблицы по условиям и сортировке запроса.
+
+    Сначала идут колонки из условий WHERE, затем колонки ORDER BY
+    в порядке и направлении сортировки.
+    """
+    model, columns = get_model_fields(table)
+    if model is None:
+        return None
+    where_part = sql.split(' ORDER BY ')[0].partition(' WHERE ')[2]
+    fields = [
+        columns[column]
+        for where_table, column in WHERE_COLUMN.findall(where_part)
+        if where_table == table and column in columns
+    ]
+    order_by = ORDER_BY.search(sql)
+    if order_by:
+        fields += [
+            f'-{columns[column]}' if desc else columns[column]
+            for order_table, column, desc in ORDER_COLUMN.findall(
+                order_by.group(1)
+            )
+            if order_table == table and column in columns
+        ]
+    fields = list(dict.fromkeys(fields))
+    if not fields:
+        return None
+    return model, f'models.Index(fields={tuple(fields)!r})'
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницы из QUERY_BUDGETS на текущей базе, выполняет '
+        'EXPLAIN QUERY PLAN для их SQL и подсказывает недостающие индексы. '
+        'Все изменения, сделанные при обходе страниц, откатываются.'
+    )
+
+    def handle(self, *args, **options):
+        suggestions = {}
+        with transaction.atomic():
+            for url_name in settings.QUERY_BUDGETS:
+                if ' ' in url_name:
+                    continue
+                for alias, sql in self.capture(url_name):
+                    self.check_plan(url_name, alias, sql, suggestions)
+            transaction.set_rollback(True)
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('Проблем не найдено.'))
+            return
+        self.stdout.write('\nПредлагаемые индексы:')
+        for (model, index), url_names in suggestions.items():
+            self.stdout.write(
+                f'  {model.__name__}.Meta.indexes: {index} '
+                f'({", ".join(sorted(url_names))})'
+            )
+
+    def get_request(self, url_name):
+        """
+        Аргументы URL, пользователь, от имени которого его открыть,
+        и GET-параметры.
+        """
+        note = Note.objects.select_related('author').first()
+        if url_name.startswith('users:'):
+            return (), None, {}
+        if url_name in ('notes:detail', 'notes:edit', 'notes:delete'):
+            return (note.slug,), note.author, {}
+        if url_name == 'notes:search':
+            return (), note.author, {'q': note.title}
+        return (), note.author, {}
+
+    def capture(self, url_name):
+        """
+        Псевдоним БД и SQL всех SELECT, выполненных при открытии страницы.
+
+        Запросы собираются со всех подключений: с роутером реплики
+        чтения идут не в default.
+        """
+        try:
+            args, user, data = self.get_request(url_name)
+        except AttributeError:
+            self.stderr.write(f'{url_name}: в базе нет данных, пропускаю')
+            return []
+        client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_login(user)
+        # CaptureQueriesContext считает запросы по длине журнала,
+        # а заполненный журнал (queries_limit при DEBUG) не растёт.
+        reset_queries()
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(CACHES=NO_CACHE))
+            contexts = {
+                connection.alias: stack.enter_context(
+                    CaptureQueriesContext(connection)
+                )
+                for connection in connections.all()
+            }
+            response = client.get(reverse(url_name, args=args), data)
+            # Тело потокового ответа читается уже после get().
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return [
+            (alias, query['sql'])
+            for alias, context in contexts.items()
+            for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+
+    def check_plan(self, url_name, alias, sql, suggestions):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        scans = [FULL_SCAN.match(detail) for detail in details]
+        tables = {scan.group(1) for scan in scans if scan}
+        order_by = ORDER_BY.search(sql)
+        # Сортировку по выражению, например рангу поиска, индекс
+        # не ускорит.
+        if order_by and ORDER_COLUMN.search(order_by.group(1)) and any(
+            detail.startswith(TEMP_SORT) for detail in details
+        ):
+            tables.update(re.findall(r' FROM "(\w+)"', sql)[:1])
+        if not tables:
+            return
+        problems = [
+            detail for detail, scan in zip(details, scans)
+            if scan or detail.startswith(TEMP_SORT)
+        ]
+        self.stdout.write(self.style.WARNING(
+            f'{url_name}: {"; ".join(problems)}'
+        ))
+        self.stdout.write(f'  {sql}')
+        for table in tables:
+            suggestion = suggest_index(table, sql)
+            if suggestion:
+                suggestions.setdefault(suggestion, set()).add(url_name)
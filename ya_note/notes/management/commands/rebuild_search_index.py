@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from notes.search import NOTES_INDEX, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс заметок.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'{NOTES_INDEX}: проиндексировано строк {rebuild(NOTES_INDEX)}'
+        ))
@@ -0,0 +1,159 @@
+import random
+from itertools import accumulate
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, reset_queries, transaction
+from django.db.models import Max
+
+from notes.importer import TITLE_MAX_LENGTH, SlugAllocator, chunks
+from notes.models import Note
+
+User = get_user_model()
+
+WORDS = (
+    'список покупок идеи планы встреча проект задачи отпуск книги '
+    'фильмы рецепт пароли заметка работа дом дача ремонт подарки '
+    'учёба курс лекция звонок врач спорт тренировка бюджет поездка '
+    'на неделю месяц важное срочно потом черновик вопросы ответы'
+).split()
+
+
+def power_law_counts(total, size, alpha):
+    """
+    Делит total на size долей, пропорциональных 1 / rank ** alpha.
+
+    Доли выдаются по одной, а ошибка округления переносится
+    на следующие, так что сумма ровно total при памяти O(1).
+    """
+    norm = sum(rank ** -alpha for rank in range(1, size + 1))
+    cumulative = 0.0
+    emitted = 0
+    for rank in range(1, size + 1):
+        cumulative += rank ** -alpha
+        target = total if rank == size else round(total * cumulative / norm)
+        yield target - emitted
+        emitted = target
+
+
+def phrase(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def make_titles(rng, size):
+    """
+    Набор заголовков длиной как у настоящих заметок.
+
+    Число слов распределено логнормально: чаще всего два-три слова,
+    изредка длинная фраза до предела поля.
+    """
+    return [
+        ' '.join(rng.choices(
+            WORDS, k=max(1, round(rng.lognormvariate(0.9, 0.5)))
+        )).capitalize()[:TITLE_MAX_LENGTH]
+        for _ in range(size)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу детерминированными данными для замеров: '
+        'пользователи и заметки. Заметки распределены по авторам '
+        'по степенному закону, заголовки повторяются, и занятые slug '
+        'получают суффиксы -2, -3, ... как при импорте.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--notes', type=int, default=100000)
+        parser.add_argument(
+            '--titles', type=int, default=5000,
+            help='Сколько разных заголовков; популярные повторяются чаще.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степени: чем больше, тем сильнее перекос.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Заметок в одном bulk_create.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100000,
+            help='Строк в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 and options['notes']:
+            raise CommandError('Заметкам нужен хотя бы один автор.')
+        if User.objects.filter(
+            username__startswith=f'seed{options["seed"]}_'
+        ).exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже есть, '
+                'выберите другое значение.'
+            )
+        self.options = options
+        self.user_base = User.objects.aggregate(Max('pk'))['pk__max'] or 0
+        try:
+            self.seed('Пользователи', User, self.build_users())
+            self.seed('Заметки', Note, self.build_notes(), SlugAllocator())
+        except DatabaseError as error:
+            raise CommandError(f'Заполнение остановлено: {error!r}')
+
+    def seed(self, name, model, objects, allocator=None):
+        """Пишет объекты пачками и сообщает скорость после каждой порции."""
+        created = 0
+        started = perf_counter()
+        for chunk in chunks(objects, self.options['chunk_size']):
+            with transaction.atomic():
+                for batch in chunks(chunk, self.options['batch_size']):
+                    if allocator:
+                        allocator.allocate(batch)
+                    model.objects.bulk_create(batch)
+            # При DEBUG каждый INSERT с тысячами строк оседает в
+            # connection.queries; на 10^8 строк это гигабайты.
+            reset_queries()
+            created += len(chunk)
+            elapsed = perf_counter() - started
+            self.stdout.write(
+                f'{name}: {created}, {created / elapsed:.0f} строк/с'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: создано {created} за {perf_counter() - started:.1f} с'
+        ))
+
+    def build_users(self):
+        password = make_password(None)
+        for number in range(1, self.options['users'] + 1):
+            yield User(
+                pk=self.user_base + number,
+                username=f'seed{self.options["seed"]}_{number}',
+                password=password,
+            )
+
+    def build_notes(self):
+        """Автор ранга rank - пользователь с id user_base + rank."""
+        rng = random.Random(f'{self.options["seed"]}:notes')
+        titles = make_titles(rng, max(self.options['titles'], 1))
+        popularity = list(accumulate(
+            rank ** -self.options['alpha']
+            for rank in range(1, len(titles) + 1)
+        ))
+        counts = power_law_counts(
+            self.options['notes'], self.options['users'],
+            self.options['alpha']
+        )
+        for rank, note_count in enumerate(counts, start=1):
+            for _ in range(note_count):
+                yield Note(
+                    title=rng.choices(titles, cum_weights=popularity)[0],
+                    text='. '.join(
+                        phrase(rng, 3, 12).capitalize()
+                        for _ in range(rng.randint(1, 6))
+                    ) + '.',
+                    author_id=self.user_base + rank,
+                )
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+
+def fts_sql(table, columns):
+    """
+    SQL индекса FTS5 с внешним содержимым и триггеров синхронизации.
+
+    Индекс хранит только токены, текст для snippet() читается
+    из самой таблицы по rowid.
+    """
+    index = f'{table}_fts'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    insert = (
+        f'INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new});'
+    )
+    delete = (
+        f"INSERT INTO {index}({index}, rowid, {names}) "
+        f"VALUES ('delete', old.id, {old});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE {index} USING fts5({names}, "
+        f"content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2');",
+        f'CREATE TRIGGER {index}_ai AFTER INSERT ON {table} '
+        f'BEGIN {insert} END;',
+        f'CREATE TRIGGER {index}_ad AFTER DELETE ON {table} '
+        f'BEGIN {delete} END;',
+        f'CREATE TRIGGER {index}_au AFTER UPDATE OF {names} ON {table} '
+        f'BEGIN {delete} {insert} END;',
+        f"INSERT INTO {index}({index}) VALUES ('rebuild');",
+    ]
+
+
+def drop_sql(table):
+    index = f'{table}_fts'
+    return [
+        f'DROP TRIGGER {index}_ai;',
+        f'DROP TRIGGER {index}_ad;',
+        f'DROP TRIGGER {index}_au;',
+        f'DROP TABLE {index};',
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            fts_sql('notes_note', ('title', 'text')),
+            drop_sql('notes_note'),
+        ),
+    ]
@@ -30,9 +30,23 @@ class Note(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='note_author_id_idx'
+            ),
+        )
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает автора из БД, чтобы заметить его смену."""
+        note = super().from_db(db, field_names, values)
+        note._loaded_author_id = note.__dict__.get('author_id')
+        return note
+
     def save(self, *args, **kwargs):
         if not self.slug:
             max_slug_length = self._meta.get_field('slug').max_length
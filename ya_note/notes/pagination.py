@@ -0,0 +1,34 @@
+# Больше не помещается в целое SQLite.
+MAX_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor):
+    """Id из курсора; для некорректного значения возвращает None."""
+    try:
+        cursor = int(cursor)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= cursor <= MAX_ID:
+        return None
+    return cursor
+
+
+def keyset_page(queryset, cursor, size):
+    """
+    Страница заметок после курсора в порядке id.
+
+    Курсор - id последней заметки предыдущей страницы. Условие
+    id > курсора вместо OFFSET позволяет индексу (author, id) сразу
+    встать на начало страницы, поэтому дальние страницы стоят столько
+    же, сколько первая. Некорректный курсор означает первую страницу.
+    Возвращает объекты страницы и курсор следующей страницы.
+    """
+    queryset = queryset.order_by('id')
+    cursor = decode_cursor(cursor)
+    if cursor is not None:
+        queryset = queryset.filter(id__gt=cursor)
+    objects = list(queryset[:size + 1])
+    if len(objects) <= size:
+        return objects, None
+    objects = objects[:size]
+    return objects, objects[-1].id
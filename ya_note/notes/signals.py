@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_notes_version
+from .models import Note
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def bump_version_on_note_change(sender, instance, **kwargs):
+    """
+    Любое изменение заметки меняет версию заметок её автора.
+
+    Если заметку передали другому автору, версия меняется и у прежнего,
+    чтобы у него в кеше не осталась чужая заметка.
+    """
+    previous_author_id = getattr(instance, '_loaded_author_id', None)
+    for author_id in {instance.author_id, previous_author_id} - {None}:
+        bump_notes_version(author_id)
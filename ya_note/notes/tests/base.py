@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from notes.models import Note, User
+
+NOTE_SLUG_FOR_TEST = 'test_slug'
+
+# Стойкость хеша паролей в тестах не нужна, а PBKDF2 - самая дорогая
+# часть создания пользователя с паролем.
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# Кеш в памяти процесса: тесты не делят кеш с запущенным сервером.
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+def build_snapshot():
+    """Пользователи и заметка, общие для всех тестов заметок."""
+    author = User.objects.create(username='IceFrog')
+    reader = User.objects.create(username='IamGroot')
+    note = Note.objects.create(
+        title='Test title',
+        text='Test text',
+        author=author,
+        slug=NOTE_SLUG_FOR_TEST,
+    )
+    return SimpleNamespace(author=author, reader=reader, note=note)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS, CACHES=LOCAL_CACHES
+)
+class BaseTestCase(TestCase):
+    """
+    Основа тестов заметок.
+
+    Граф build_snapshot() создаётся один раз на процесс перед первым
+    классом и фиксируется в базе, вне транзакций классов. Данные
+    setUpTestData создаются один раз на класс, а перед каждым тестом
+    база возвращается к ним откатом до точки сохранения; объекты
+    снимка setUpTestData берёт из snapshot и тоже получает копию
+    на каждый тест. Транзакционные тесты очищают базу, но Django
+    и pytest-django запускают их после всех TestCase.
+    Кеш страниц и пользователей в базу не входит, поэтому
+    очищается отдельно.
+    """
+    snapshot = None
+
+    @classmethod
+    def setUpClass(cls):
+        if BaseTestCase.snapshot is None:
+            # Настройки класса включит только super().setUpClass().
+            with override_settings(CACHES=LOCAL_CACHES):
+                BaseTestCase.snapshot = build_snapshot()
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
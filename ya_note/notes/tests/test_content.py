@@ -1,23 +1,33 @@
-from django.test import Client, TestCase
+import zipfile
+from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
+
+from django.test import Client, override_settings
 from django.urls import reverse
 
+from notes import export
+from notes.cache import get_cache_stats
 from notes.forms import NoteForm
-from notes.models import Note, User
+from notes.models import Note
+from notes.tests.base import NOTE_SLUG_FOR_TEST, BaseTestCase
 
-NOTE_SLUG_FOR_TEST = 'test_slug'
 LIST_URL = reverse('notes:list')
 ADD_URL = reverse('notes:add')
 EDIT_URL = reverse('notes:edit', args=(NOTE_SLUG_FOR_TEST,))
+DETAIL_URL = reverse('notes:detail', args=(NOTE_SLUG_FOR_TEST,))
+SEARCH_URL = reverse('notes:search')
+EXPORT_URL = reverse('notes:export')
 
 
-class TestContent(TestCase):
+class TestContent(BaseTestCase):
     @classmethod
     def setUpTestData(cls):
         cls.guest = Client()
-        cls.author_user = User.objects.create(username='IamGroot')
+        cls.author_user = cls.snapshot.author
         cls.author = Client()
         cls.author.force_login(cls.author_user)
-        cls.reader = User.objects.create(username='IceFrog')
+        cls.reader = cls.snapshot.reader
         cls.another = Client()
         cls.another.force_login(cls.reader)
         Note.objects.bulk_create(
@@ -29,12 +39,7 @@ class TestContent(TestCase):
             )
             for index in range(2)
         )
-        cls.note = Note.objects.create(
-            title='Test title',
-            text='Test text',
-            author=cls.author_user,
-            slug=NOTE_SLUG_FOR_TEST,
-        )
+        cls.note = cls.snapshot.note
 
     def test_notes_count(self):
         self.assertEqual(
@@ -42,6 +47,35 @@ class TestContent(TestCase):
             self.author_user.note_set.count()
         )
 
+    @override_settings(NOTES_COUNT_ON_LIST_PAGE=2)
+    def test_notes_list_keyset_pages(self):
+        context = self.author.get(LIST_URL).context
+        first_page = context['object_list']
+        self.assertEqual(
+            [note.slug for note in first_page], [NOTE_SLUG_FOR_TEST, 'note0']
+        )
+        self.assertEqual(context['next_cursor'], first_page[-1].id)
+        self.assertEqual(
+            first_page[0].get_deferred_fields(), {'text', 'author_id'}
+        )
+        context = self.author.get(
+            LIST_URL, {'after': context['next_cursor']}
+        ).context
+        self.assertEqual(
+            [note.slug for note in context['object_list']], ['note1']
+        )
+        self.assertIsNone(context['next_cursor'])
+
+    def test_notes_list_invalid_cursor_shows_first_page(self):
+        first_page = list(self.author.get(LIST_URL).context['object_list'])
+        for after in ('9' * 30, str(2 ** 63), '-1', 'x'):
+            with self.subTest(after=after):
+                response = self.author.get(LIST_URL, {'after': after})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    list(response.context['object_list']), first_page
+                )
+
     def test_notes_list_for_different_users(self):
         clients_availability = (
             (self.author, True),
@@ -60,3 +94,120 @@ class TestContent(TestCase):
                 context = self.author.get(url).context
                 self.assertIn('form', context)
                 self.assertIsInstance(context['form'], NoteForm)
+
+    def test_not_modified_without_rendering(self):
+        for index, url in enumerate((LIST_URL, DETAIL_URL)):
+            with self.subTest(url=url):
+                etag = self.author.get(url)['ETag']
+                response = self.author.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response.templates, [])
+                Note.objects.create(
+                    title='Ещё заметка',
+                    text='Текст',
+                    author=self.author_user,
+                    slug=f'more{index}',
+                )
+                self.assertEqual(
+                    self.author.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    ).status_code,
+                    HTTPStatus.OK
+                )
+
+    def test_etag_depends_on_user(self):
+        etag = self.author.get(LIST_URL)['ETag']
+        self.assertEqual(
+            self.another.get(LIST_URL, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.OK
+        )
+
+    def test_search_only_own_notes(self):
+        Note.objects.create(
+            title='Чужая', text='Test text', author=self.reader, slug='alien'
+        )
+        notes = self.author.get(
+            SEARCH_URL, {'q': 'tes'}
+        ).context['object_list']
+        self.assertEqual([note.slug for note in notes], [NOTE_SLUG_FOR_TEST])
+        self.assertEqual(notes[0].snippet, '<mark>Test</mark> text')
+
+    def test_search_escapes_snippet_and_follows_edits(self):
+        self.note.text = '<script>пароль</script> в заметке'
+        self.note.save()
+        notes = self.author.get(
+            SEARCH_URL, {'q': 'пароль"*('}
+        ).context['object_list']
+        self.assertEqual(
+            notes[0].snippet,
+            '&lt;script&gt;<mark>пароль</mark>&lt;/script&gt; в заметке'
+        )
+        self.assertFalse(
+            self.author.get(SEARCH_URL, {'q': 'test text'}).context[
+                'object_list'
+            ]
+        )
+
+    def test_list_and_detail_served_from_cache(self):
+        for url in (LIST_URL, DETAIL_URL):
+            with self.subTest(url=url):
+                stats = get_cache_stats()
+                first = self.author.get(url).content
+                with self.assertNumQueries(2):
+                    self.assertEqual(self.author.get(url).content, first)
+                self.assertEqual(get_cache_stats(), {
+                    'hits': stats['hits'] + 1,
+                    'misses': stats['misses'] + 1,
+                })
+
+    def test_cache_follows_note_changes(self):
+        self.author.get(LIST_URL)
+        self.author.get(DETAIL_URL)
+        self.note.title = 'Новый заголовок'
+        self.note.save()
+        for url in (LIST_URL, DETAIL_URL):
+            with self.subTest(url=url):
+                self.assertContains(self.author.get(url), 'Новый заголовок')
+
+    def test_cache_never_shows_note_to_previous_author(self):
+        self.author.get(LIST_URL)
+        self.another.get(LIST_URL)
+        note = Note.objects.get(pk=self.note.pk)
+        note.author = self.reader
+        note.save()
+        self.assertNotIn(
+            self.note, self.author.get(LIST_URL).context['object_list']
+        )
+        self.assertEqual(
+            self.author.get(DETAIL_URL).status_code, HTTPStatus.NOT_FOUND
+        )
+        self.assertIn(
+            self.note, self.another.get(LIST_URL).context['object_list']
+        )
+
+    def export(self, client):
+        response = client.get(EXPORT_URL)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+    @override_settings(NOTES_EXPORT_CHUNK_SIZE=2, NOTES_EXPORT_BUFFER_SIZE=1)
+    def test_export_streams_own_notes_as_markdown(self):
+        archive = self.export(self.author)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            archive.namelist(),
+            [f'{NOTE_SLUG_FOR_TEST}.md', 'note0.md', 'note1.md']
+        )
+        self.assertEqual(
+            archive.read(f'{NOTE_SLUG_FOR_TEST}.md').decode(),
+            '# Test title\n\nTest text\n'
+        )
+        self.assertEqual(self.export(self.another).namelist(), [])
+
+    def test_export_writes_zip64_end_for_many_files(self):
+        with mock.patch.object(export, 'MAX_16', 2):
+            archive = self.export(self.author)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(len(archive.namelist()), 3)
@@ -1,33 +1,70 @@
+import asyncio
+import io
+import sqlite3
+import tempfile
+import zipfile
+from contextlib import closing
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
 
-from django.test import Client, TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import (
+    DEFAULT_DB_ALIAS, connection, connections, reset_queries
+)
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TransactionTestCase,
+    override_settings
+)
 from django.urls import reverse
 from pytils.translit import slugify
 
+from notes import importer
 from notes.forms import WARNING
+from notes.management.commands.index_advisor import (
+    Command as IndexAdvisor
+)
 from notes.models import Note, User
+from notes.tests.base import LOCAL_CACHES, NOTE_SLUG_FOR_TEST, BaseTestCase
+from yanote.auth import (
+    USER_KEY, CachedModelBackend, forget_user, get_user_version
+)
+from yanote.ratelimit import RateLimitMiddleware
+from yanote.replica import (
+    REPLICA_DB_ALIAS, PrimaryStickinessMiddleware, ReplicaRouter, primary
+)
 
-NOTE_SLUG_FOR_TEST = 'test_slug'
 ADD_URL = reverse('notes:add')
 SUCCESS_URL = reverse('notes:success')
 EDIT_URL = reverse('notes:edit', args=(NOTE_SLUG_FOR_TEST,))
 DELETE_URL = reverse('notes:delete', args=(NOTE_SLUG_FOR_TEST,))
 LOGIN_URL = reverse('users:login')
+LOGOUT_URL = reverse('users:logout')
+LIST_URL = reverse('notes:list')
+IMPORT_URL = reverse('notes:import')
 
 
-class TestNoteCreation(TestCase):
+class TestNoteCreation(BaseTestCase):
     NOTE_TITLE = 'Test Title'
     NOTE_TEXT = 'Test Text'
+    NOTE_SLUG = 'new_note'
 
     @classmethod
     def setUpTestData(cls):
-        cls.user = User.objects.create(username='IamGroot')
+        cls.user = cls.snapshot.reader
         cls.auth_client = Client()
         cls.auth_client.force_login(cls.user)
         cls.form_data = {
             'title': cls.NOTE_TITLE,
             'text': cls.NOTE_TEXT,
-            'slug': NOTE_SLUG_FOR_TEST,
+            'slug': cls.NOTE_SLUG,
         }
 
     def test_anonymous_user_cant_create_note(self):
@@ -53,28 +90,50 @@ class TestNoteCreation(TestCase):
         self.assertEqual(note.slug, self.form_data['slug'])
         self.assertEqual(note.author, self.user)
 
+    @override_settings(
+        RATE_LIMITS={'notes:add': {'requests': 2, 'period': 60}}
+    )
+    def test_note_creation_is_rate_limited(self):
+        for number in range(2):
+            self.auth_client.post(
+                ADD_URL, data={**self.form_data, 'slug': f'note-{number}'}
+            )
+        # Сессия и пользователь: до представления запрос не доходит.
+        with self.assertNumQueries(2):
+            response = self.auth_client.post(ADD_URL, data=self.form_data)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertLessEqual(int(response['Retry-After']), 60)
+        self.assertEqual(Note.objects.filter(author=self.user).count(), 2)
 
-class TestNoteEditDeleteUseNotUniqueSlug(TestCase):
-    NOTE_TITLE = 'Test Title'
-    NOTE_TEXT = 'Test Text'
+    def test_rate_limits_require_atomic_cache(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            RATE_LIMITS={'notes:add': {'requests': 2, 'period': 60}},
+            CACHES={'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }},
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                RateLimitMiddleware(HttpResponse)
+            with override_settings(RATE_LIMITS={}):
+                RateLimitMiddleware(HttpResponse)
+
+
+class TestNoteEditDeleteUseNotUniqueSlug(BaseTestCase):
     NEW_NOTE_TITLE = 'New Title'
     NEW_NOTE_TEXT = 'New Text'
     NEW_NOTE_SLUG = 'new_slug'
 
     @classmethod
     def setUpTestData(cls):
-        cls.author = User.objects.create(username='IceFrog')
+        cls.author = cls.snapshot.author
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
-        cls.reader = User.objects.create(username='IamGroot')
+        cls.reader = cls.snapshot.reader
         cls.reader_client = Client()
         cls.reader_client.force_login(cls.reader)
-        cls.note = Note.objects.create(
-            title=cls.NOTE_TITLE,
-            text=cls.NOTE_TEXT,
-            author=cls.author,
-            slug=NOTE_SLUG_FOR_TEST,
-        )
+        cls.note = cls.snapshot.note
         cls.form_data = {
             'title': cls.NEW_NOTE_TITLE,
             'text': cls.NEW_NOTE_TEXT,
@@ -159,3 +218,434 @@ class TestNoteEditDeleteUseNotUniqueSlug(TestCase):
         self.assertEqual(self.note.text, note_from_db.text)
         self.assertEqual(self.note.slug, note_from_db.slug)
         self.assertEqual(self.note.author, note_from_db.author)
+
+
+class TestIndexAdvisor(BaseTestCase):
+    def test_index_advisor_finds_no_problems(self):
+        out = StringIO()
+        call_command('index_advisor', stdout=out)
+        self.assertIn('Проблем не найдено', out.getvalue())
+
+    @override_settings(DEBUG=True)
+    def test_index_advisor_captures_queries_of_every_page(self):
+        # Журнал запросов длинного прогона при DEBUG заполнен до предела
+        # и больше не растёт.
+        connection.queries_log.extend(
+            {'sql': '', 'time': '0'} for _ in range(connection.queries_limit)
+        )
+        self.addCleanup(reset_queries)
+        command = IndexAdvisor()
+        for url_name, budget in settings.QUERY_BUDGETS.items():
+            if ' ' in url_name or not budget['queries']:
+                continue
+            # Второй раз страница уже могла бы прийти из кеша.
+            for attempt in range(2):
+                with self.subTest(url_name=url_name, attempt=attempt):
+                    self.assertTrue(command.capture(url_name))
+
+    def test_index_advisor_flags_missing_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' "
+                "AND tbl_name = 'notes_note' AND sql LIKE '%author_id%'"
+            )
+            for (name,) in cursor.fetchall():
+                cursor.execute(f'DROP INDEX "{name}"')
+        out = StringIO()
+        # Новый LIMIT меняет текст запроса: sqlite3 не возьмёт из кеша
+        # выражений план, построенный до удаления индексов.
+        with override_settings(
+            QUERY_BUDGETS={'notes:list': {'queries': 3, 'time_ms': 50}},
+            NOTES_COUNT_ON_LIST_PAGE=7,
+        ):
+            call_command('index_advisor', stdout=out)
+        self.assertIn('notes:list: SCAN notes_note', out.getvalue())
+        self.assertIn(
+            "Note.Meta.indexes: models.Index(fields=('author', 'id'))",
+            out.getvalue()
+        )
+
+
+class TestFastAuthPath(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.snapshot.reader
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.shared_caches = {
+            'default': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': directory.name,
+            }
+        }
+
+    def cached_user(self):
+        return cache.get(USER_KEY.format(
+            user_id=self.user.pk, version=get_user_version(self.user.pk)
+        ))
+
+    def test_process_local_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CachedModelBackend()
+
+    def test_logged_in_list_from_cache_runs_no_queries(self):
+        for profile in ('cache', 'signed_cookies'):
+            with self.subTest(profile=profile), override_settings(
+                CACHES=self.shared_caches,
+                **settings.SESSION_PROFILES[profile]
+            ):
+                client = Client()
+                client.force_login(self.user)
+                client.get(LIST_URL)
+                with self.assertNumQueries(0):
+                    response = client.get(LIST_URL)
+                self.assertEqual(response.context['user'], self.user)
+
+    def test_user_forgotten_on_password_change_and_logout(self):
+        for profile in ('cache', 'signed_cookies'):
+            with self.subTest(profile=profile), override_settings(
+                CACHES=self.shared_caches,
+                **settings.SESSION_PROFILES[profile]
+            ):
+                client = Client()
+                client.force_login(self.user)
+                client.get(LIST_URL)
+                self.assertEqual(self.cached_user(), self.user)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.user.set_password('new password')
+                    self.user.save()
+                self.assertIsNone(self.cached_user())
+                self.assertRedirects(
+                    client.get(LIST_URL), f'{LOGIN_URL}?next={LIST_URL}'
+                )
+                client.force_login(self.user)
+                client.get(LIST_URL)
+                client.get(LOGOUT_URL)
+                self.assertIsNone(self.cached_user())
+
+    def test_user_cached_before_change_is_ignored(self):
+        with override_settings(CACHES=self.shared_caches):
+            backend = CachedModelBackend()
+            # Запрос прочитал версию и пользователя до изменения,
+            # а положил его в кеш уже после.
+            stale_key = USER_KEY.format(
+                user_id=self.user.pk, version=get_user_version(self.user.pk)
+            )
+            stale_user = User.objects.get(pk=self.user.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+            cache.add(stale_key, stale_user)
+            self.assertIsNone(backend.get_user(self.user.pk))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = True
+                self.user.save()
+            self.assertEqual(backend.get_user(self.user.pk), self.user)
+            # update() обходит post_save: версию меняет forget_user.
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.assertEqual(backend.get_user(self.user.pk), self.user)
+            forget_user(self.user.pk)
+            self.assertIsNone(backend.get_user(self.user.pk))
+
+
+class TestNotesCacheStats(BaseTestCase):
+    def test_notes_cache_stats_command(self):
+        out = StringIO()
+        call_command('notes_cache_stats', stdout=out)
+        self.assertIn('Попаданий:', out.getvalue())
+
+
+class TestNoteImport(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.snapshot.author
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.author)
+        Note.objects.create(
+            title='Заметка', text='Текст', author=cls.author, slug='zametka'
+        )
+
+    def test_slugify_matches_pytils(self):
+        for title in (
+            'Заметка', 'Щука & ёж', 'Съешь же ещё этих «булок»!',
+            'Hello,  World -- 2', 'Ёлка\tи\nЯблоко', '', '日本語',
+        ):
+            with self.subTest(title=title):
+                self.assertEqual(importer.slugify(title), slugify(title))
+
+    def test_batch_gets_deterministic_suffixes_with_one_query(self):
+        notes = [
+            Note(title=title, text='Текст', author=self.author)
+            for title in ('Заметка', 'Другая', 'Заметка', 'zametka-2')
+        ]
+        with self.assertNumQueries(1):
+            importer.SlugAllocator().allocate(notes)
+        self.assertEqual(
+            [note.slug for note in notes],
+            ['zametka-2', 'drugaya', 'zametka-3', 'zametka-2-2']
+        )
+
+    def test_import_notes_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'notes.jsonl'
+            path.write_text(
+                '{"title": "Заметка", "text": "Раз"}\n'
+                '{"title": "Своя", "text": "Два", "slug": "own"}\n',
+                encoding='utf-8'
+            )
+            call_command(
+                'import_notes', str(path), author=self.author.username,
+                batch_size=1, stdout=StringIO()
+            )
+        self.assertEqual(
+            list(Note.objects.filter(
+                text__in=('Раз', 'Два')
+            ).order_by('id').values_list('slug', flat=True)),
+            ['zametka-2', 'own']
+        )
+
+    def test_user_can_upload_notes(self):
+        upload = SimpleUploadedFile(
+            'notes.csv', 'title,text\nЗаметка,Из файла\n'.encode()
+        )
+        self.assertRedirects(
+            self.auth_client.post(IMPORT_URL, {'file': upload}),
+            reverse('notes:success')
+        )
+        note = Note.objects.get(text='Из файла')
+        self.assertEqual((note.slug, note.author), ('zametka-2', self.author))
+
+    def test_broken_upload_imports_nothing(self):
+        notes_count = Note.objects.count()
+        upload = SimpleUploadedFile(
+            'notes.jsonl', '{"title": "Раз", "text": "1"}\n{'.encode()
+        )
+        response = self.auth_client.post(IMPORT_URL, {'file': upload})
+        self.assertIn(
+            'Файл не загружен', response.context['form'].errors['file'][0]
+        )
+        self.assertEqual(Note.objects.count(), notes_count)
+
+    def test_invalid_rows_are_rejected_with_line_number(self):
+        notes_count = Note.objects.count()
+        for line in (
+            '[1, 2]', '{"title": null, "text": "1"}',
+            '{"title": 5, "text": "1"}', '{"title": "Раз"}',
+            '{"title": "Раз", "text": "1", "slug": 7}',
+        ):
+            with self.subTest(line=line):
+                upload = SimpleUploadedFile(
+                    'notes.jsonl',
+                    f'{{"title": "Раз", "text": "1"}}\n\n{line}\n'.encode()
+                )
+                response = self.auth_client.post(IMPORT_URL, {'file': upload})
+                self.assertIn(
+                    'Строка 3', response.context['form'].errors['file'][0]
+                )
+        self.assertEqual(Note.objects.count(), notes_count)
+
+    def test_broken_csv_is_rejected_with_line_number(self):
+        notes_count = Note.objects.count()
+        upload = SimpleUploadedFile(
+            'notes.csv',
+            f'title,text\nРаз,1\nДва,{"x" * 200000}\n'.encode()
+        )
+        response = self.auth_client.post(IMPORT_URL, {'file': upload})
+        self.assertIn(
+            'Строка 3', response.context['form'].errors['file'][0]
+        )
+        self.assertEqual(Note.objects.count(), notes_count)
+
+    @override_settings(NOTES_IMPORT_MAX_SIZE=100, NOTES_IMPORT_MAX_ROWS=2)
+    def test_upload_size_and_rows_are_limited(self):
+        notes_count = Note.objects.count()
+        for content in (
+            'title,text\n' + 'Заметка,Текст\n' * 3,
+            'title,text\nЗаметка,' + 'Текст' * 20 + '\n',
+        ):
+            with self.subTest(content=content):
+                upload = SimpleUploadedFile('notes.csv', content.encode())
+                response = self.auth_client.post(IMPORT_URL, {'file': upload})
+                self.assertIn(
+                    'частями', response.context['form'].errors['file'][0]
+                )
+        self.assertEqual(Note.objects.count(), notes_count)
+
+
+class TestSeed(BaseTestCase):
+    def test_seed_command_collides_titles_and_skews_authors(self):
+        call_command(
+            'seed', users=4, notes=200, titles=10, batch_size=30,
+            stdout=StringIO()
+        )
+        notes = Note.objects.filter(author__username__startswith='seed0_')
+        self.assertEqual(notes.count(), 200)
+        self.assertLessEqual(notes.values('title').distinct().count(), 10)
+        counts = [
+            notes.filter(author__username=f'seed0_{rank}').count()
+            for rank in range(1, 5)
+        ]
+        self.assertEqual(counts[0], max(counts))
+        self.assertGreater(counts[0], 200 / 4)
+
+
+class TestReplicaRouting(SimpleTestCase):
+    """Вне транзакции основной БД, иначе все чтения идут в неё."""
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Note), 'replica')
+        self.assertEqual(router.db_for_write(Note), 'default')
+        with primary():
+            self.assertEqual(router.db_for_read(Note), 'default')
+        self.assertEqual(router.db_for_read(Note), 'replica')
+        self.assertEqual(router.db_for_read(Session), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'notes'))
+
+    def test_client_sticks_to_primary_after_write(self):
+        cases = (
+            ('get', {}, 'replica', False),
+            ('get', {settings.REPLICA_STICKY_COOKIE: '1'}, 'default', False),
+            ('post', {}, 'default', True),
+        )
+        for method, cookies, database, sticky in cases:
+            with self.subTest(method=method, cookies=cookies):
+                databases = []
+
+                def get_response(request):
+                    databases.append(ReplicaRouter().db_for_read(Note))
+                    return HttpResponse()
+
+                request = getattr(RequestFactory(), method)('/')
+                request.COOKIES.update(cookies)
+                response = PrimaryStickinessMiddleware(get_response)(
+                    request
+                )
+                self.assertEqual(databases, [database])
+                self.assertEqual(
+                    settings.REPLICA_STICKY_COOKIE in response.cookies,
+                    sticky
+                )
+
+    def test_middleware_keeps_async_chain(self):
+        databases = []
+
+        async def get_response(request):
+            databases.append(ReplicaRouter().db_for_read(Note))
+            return HttpResponse()
+
+        middleware = PrimaryStickinessMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().post('/'))
+        self.assertEqual(databases, ['default'])
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(ReplicaRouter().db_for_read(Note), 'replica')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TestSyncReplica(TransactionTestCase):
+    """Копия снимается с зафиксированных данных, вне транзакции теста."""
+
+    def test_sync_replica_command(self):
+        author = User.objects.create(username='author')
+        Note.objects.create(title='Заметка', text='Текст', author=author)
+        with tempfile.TemporaryDirectory() as directory:
+            replica = Path(directory) / 'replica.sqlite3'
+            with override_settings(DATABASE_REPLICA=replica):
+                call_command(
+                    'sync_replica', once=True, lag=0, stdout=StringIO()
+                )
+            with closing(sqlite3.connect(replica)) as connection:
+                self.assertEqual(
+                    connection.execute(
+                        'SELECT title FROM notes_note ORDER BY id'
+                    ).fetchall(),
+                    list(Note.objects.order_by('id').values_list('title'))
+                )
+            self.assertEqual(list(Path(directory).iterdir()), [replica])
+
+
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    DATABASE_ROUTERS=['yanote.replica.ReplicaRouter'],
+    MIDDLEWARE=[
+        'yanote.replica.PrimaryStickinessMiddleware', *settings.MIDDLEWARE
+    ],
+)
+class TestReplicaReadYourWrites(TransactionTestCase):
+    """
+    Реплика - файл-снимок основной БД, который дальше не обновляется,
+    то есть реплика с бесконечным отставанием.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica = Path(directory.name) / 'replica.sqlite3'
+        with override_settings(DATABASE_REPLICA=replica):
+            call_command('sync_replica', once=True, lag=0, stdout=StringIO())
+        connections.settings[REPLICA_DB_ALIAS] = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            'NAME': f'file:{replica}?mode=ro',
+        }
+        self.addCleanup(self.remove_replica)
+
+    @staticmethod
+    def remove_replica():
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+
+    def test_index_advisor_captures_replica_queries(self):
+        command = IndexAdvisor()
+        command.get_request = lambda url_name: ((), self.author, {})
+        aliases = {alias for alias, sql in command.capture('notes:list')}
+        self.assertEqual(aliases, {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS})
+
+    def test_writer_exports_own_note(self):
+        writer = Client()
+        writer.force_login(self.author)
+        writer.post(
+            ADD_URL, {'title': 'Новая', 'text': 'Текст', 'slug': 'new'}
+        )
+        response = writer.get(reverse('notes:export'))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(
+            response.streaming_content
+        )))
+        self.assertEqual(archive.namelist(), ['new.md'])
+
+    def test_writer_reads_own_note_through_notes_cache(self):
+        writer, reader = Client(), Client()
+        writer.force_login(self.author)
+        reader.force_login(self.author)
+        response = writer.post(
+            ADD_URL, {'title': 'Новая', 'text': 'Текст', 'slug': 'new'}
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertFalse(
+            Note.objects.using(REPLICA_DB_ALIAS).filter(slug='new').exists()
+        )
+        # Читатель без закрепления первым заполняет кеш новой версии.
+        for client in (reader, writer):
+            with self.subTest(client=client):
+                self.assertEqual(
+                    [
+                        note.title
+                        for note in client.get(LIST_URL).context[
+                            'object_list'
+                        ]
+                    ],
+                    ['Новая']
+                )
+        self.assertEqual(
+            writer.get(
+                reverse('notes:detail', args=('new',))
+            ).status_code,
+            HTTPStatus.OK
+        )
@@ -0,0 +1,81 @@
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from notes.models import Note
+from notes.tests.base import NOTE_SLUG_FOR_TEST, BaseTestCase
+from yanote.query_budget import QueryBudgetMixin, QueryTimeWarning
+
+NOTE_FORM_DATA = {'title': 'New title', 'text': 'New text', 'slug': 'new'}
+
+
+class TestQueryBudgets(QueryBudgetMixin, BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = Client()
+        cls.author_user = cls.snapshot.author
+        cls.author = Client()
+        cls.author.force_login(cls.author_user)
+        Note.objects.bulk_create(
+            Note(
+                title=f'Note{index}',
+                text='Pro100 Text',
+                author=cls.author_user,
+                slug=f'note{index}'
+            )
+            for index in range(10)
+        )
+
+    def test_pages_within_query_budget(self):
+        for url_name, args, client in (
+            ('notes:home', (), self.guest),
+            ('notes:home', (), self.author),
+            ('notes:list', (), self.author),
+            ('notes:add', (), self.author),
+            ('notes:import', (), self.author),
+            ('notes:success', (), self.author),
+            ('notes:detail', (NOTE_SLUG_FOR_TEST,), self.author),
+            ('notes:edit', (NOTE_SLUG_FOR_TEST,), self.author),
+            ('notes:delete', (NOTE_SLUG_FOR_TEST,), self.author),
+            ('users:login', (), self.guest),
+            ('users:signup', (), self.guest),
+        ):
+            with self.subTest(url_name=url_name, client=client):
+                with self.query_budget(url_name):
+                    client.get(reverse(url_name, args=args))
+        with self.query_budget('notes:search'):
+            self.author.get(reverse('notes:search'), {'q': 'text'})
+        with self.query_budget('notes:export'):
+            b''.join(
+                self.author.get(reverse('notes:export')).streaming_content
+            )
+
+    def test_writes_within_query_budget(self):
+        for url_name, args, data in (
+            ('notes:add', (), NOTE_FORM_DATA),
+            (
+                'notes:edit',
+                (NOTE_SLUG_FOR_TEST,),
+                dict(NOTE_FORM_DATA, slug='edited')
+            ),
+            ('notes:delete', ('new',), None),
+        ):
+            with self.subTest(url_name=url_name):
+                with self.query_budget(url_name, 'POST'):
+                    self.author.post(reverse(url_name, args=args), data=data)
+
+    def test_query_budget_lists_offending_sql(self):
+        with self.assertRaisesRegex(AssertionError, 'notes_note'):
+            with self.query_budget('users:login'):
+                self.author.get(reverse('notes:list'))
+
+    @override_settings(
+        QUERY_BUDGETS={'notes:list': {'queries': 3, 'time_ms': -1}}
+    )
+    def test_query_budget_time_is_a_warning_unless_strict(self):
+        with self.assertWarnsRegex(QueryTimeWarning, '-1 мс'):
+            with self.query_budget('notes:list'):
+                self.author.get(reverse('notes:list'))
+        with override_settings(QUERY_BUDGET_STRICT_TIME=True):
+            with self.assertRaisesRegex(AssertionError, '-1 мс'):
+                with self.query_budget('notes:list'):
+                    self.author.get(reverse('notes:list'))
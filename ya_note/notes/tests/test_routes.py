@@ -1,11 +1,10 @@
 from http import HTTPStatus
 
-from django.test import Client, TestCase
+from django.test import Client
 from django.urls import reverse
 
-from notes.models import Note, User
+from notes.tests.base import NOTE_SLUG_FOR_TEST, BaseTestCase
 
-NOTE_SLUG_FOR_TEST = 'test_slug'
 HOME_URL = reverse('notes:home')
 LIST_URL = reverse('notes:list')
 ADD_URL = reverse('notes:add')
@@ -20,22 +19,17 @@ OK = HTTPStatus.OK
 NOT_FOUND = HTTPStatus.NOT_FOUND
 
 
-class TestRoutes(TestCase):
+class TestRoutes(BaseTestCase):
     @classmethod
     def setUpTestData(cls):
         cls.guest = Client()
-        cls.author_user = User.objects.create(username='IceFrog')
+        cls.author_user = cls.snapshot.author
         cls.author = Client()
         cls.author.force_login(cls.author_user)
-        cls.reader = User.objects.create(username='IamGroot')
+        cls.reader = cls.snapshot.reader
         cls.another = Client()
         cls.another.force_login(cls.reader)
-        cls.note = Note.objects.create(
-            title='Test title',
-            text='Test text',
-            author=cls.author_user,
-            slug=NOTE_SLUG_FOR_TEST,
-        )
+        cls.note = cls.snapshot.note
 
     def test_pages_availability(self):
         URL_CLIENT_EXPECTED_STATUS = [
@@ -7,9 +7,12 @@ app_name = 'notes'
 urlpatterns = [
     path('', views.Home.as_view(), name='home'),
     path('add/', views.NoteCreate.as_view(), name='add'),
+    path('import/', views.NoteImport.as_view(), name='import'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('export/', views.NoteExport.as_view(), name='export'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
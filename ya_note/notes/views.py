@@ -1,9 +1,38 @@
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import DatabaseError
+from django.http import StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
+
+from yanote.replica import pin_primary, primary_pinned
 
-from .forms import NoteForm
+from .cache import get_note, get_notes_page, get_notes_version
+from .export import stream_zip
+from .forms import NoteForm, NoteImportForm
+from .importer import import_notes, read_rows
 from .models import Note
+from .pagination import keyset_page
+from .search import NOTES_INDEX, highlighted, search
+
+
+def notes_etag(request, *args, **kwargs):
+    """
+    Валидатор ETag страниц заметок: пользователь и версия его заметок.
+
+    Версия хранится в кеше, так что проверка не обращается к БД.
+    Анонимному пользователю ETag не выдаётся: его ждёт редирект
+    на страницу входа.
+    """
+    if not request.user.is_authenticated:
+        return None
+    return f'{request.user.pk}-{get_notes_version(request.user.pk)}'
 
 
 class Home(generic.TemplateView):
@@ -32,9 +61,38 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
+        return super().form_valid(form)
+
+
+class NoteImport(LoginRequiredMixin, generic.FormView):
+    """Загрузка заметок из файла."""
+    template_name = 'notes/import.html'
+    form_class = NoteImportForm
+    success_url = reverse_lazy('notes:success')
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        file_format = 'csv' if upload.name.lower().endswith(
+            '.csv'
+        ) else 'jsonl'
+        max_rows = settings.NOTES_IMPORT_MAX_ROWS
+        try:
+            # Файл разбирается до транзакции, чтобы не держать
+            # блокировку записи SQLite на время чтения.
+            rows = list(islice(read_rows(
+                io.TextIOWrapper(upload, encoding='utf-8', newline=''),
+                file_format,
+            ), max_rows + 1))
+            if len(rows) > max_rows:
+                raise ValueError(
+                    f'В файле больше {max_rows} заметок, загрузите его '
+                    'частями.'
+                )
+            import_notes(self.request.user, rows)
+        except (ValueError, KeyError, csv.Error, DatabaseError) as error:
+            form.add_error('file', f'Файл не загружен: {error!r}')
+            return self.form_invalid(form)
         return super().form_valid(form)
 
 
@@ -49,11 +107,107 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
+class NoteExport(NoteBase, generic.View):
+    """
+    Все заметки пользователя в ZIP, по файлу Markdown на заметку.
+
+    Заметки читаются страницами keyset_page по
+    NOTES_EXPORT_CHUNK_SIZE, и архив уходит клиенту по мере чтения,
+    так что память на выгрузку не зависит от числа заметок. Каждая
+    страница - отдельный короткий запрос: открытый на всю выгрузку
+    курсор держал бы блокировку чтения SQLite.
+    """
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            stream_zip(self.files(primary_pinned())),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="notes.zip"'
+        )
+        return response
+
+    def files(self, pinned):
+        """
+        Файлы архива.
+
+        Тело ответа читается уже после PrimaryStickinessMiddleware,
+        поэтому закрепление за основной БД восстанавливается
+        на время каждого запроса.
+        """
+        queryset = self.get_queryset().only('id', 'slug', 'title', 'text')
+        cursor = None
+        while True:
+            previous = pin_primary(pinned)
+            try:
+                notes, cursor = keyset_page(
+                    queryset, cursor, settings.NOTES_EXPORT_CHUNK_SIZE
+                )
+            finally:
+                pin_primary(previous)
+            for note in notes:
+                yield (
+                    f'{note.slug}.md',
+                    f'# {note.title}\n\n{note.text}\n'.encode()
+                )
+            if cursor is None:
+                return
+
+
+@method_decorator(condition(etag_func=notes_etag), name='dispatch')
 class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
-
+    def get_queryset(self):
+        """
+        Страница заметок после курсора из GET-параметра after.
+
+        Загружаются только колонки, которые выводит список;
+        страница кешируется до изменения заметок пользователя.
+        """
+        queryset = super().get_queryset().only('id', 'slug', 'title')
+        notes, self.next_cursor = get_notes_page(
+            self.request.user.pk,
+            self.request.GET.get('after'),
+            lambda cursor: keyset_page(
+                queryset, cursor, settings.NOTES_COUNT_ON_LIST_PAGE
+            ),
+        )
+        return notes
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+@method_decorator(condition(etag_func=notes_etag), name='dispatch')
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_object(self, queryset=None):
+        """Заметка кешируется до изменения заметок пользователя."""
+        return get_note(
+            self.request.user.pk, self.kwargs['slug'], super().get_object
+        )
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_queryset(self):
+        """Ищем только среди заметок, доступных через NoteBase."""
+        return highlighted(search(
+            super().get_queryset().only('slug', 'title'),
+            NOTES_INDEX, self.request.GET.get('q', ''),
+            column=1, weights='10.0, 1.0',
+        )[:settings.SEARCH_RESULTS_COUNT])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
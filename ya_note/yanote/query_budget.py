@@ -0,0 +1,79 @@
+"""
+Бюджеты SQL-запросов для страниц проекта.
+
+Бюджеты задаются в настройке QUERY_BUDGETS: имени URL (для
+не-GET запросов — с префиксом метода, например 'POST notes:add')
+сопоставляется наибольшее число запросов и суммарное время в БД
+в миллисекундах.
+
+Число запросов проверяется всегда. Время зависит от загрузки машины,
+поэтому его превышение по умолчанию даёт только QueryTimeWarning,
+а ошибкой становится при QUERY_BUDGET_STRICT_TIME=1.
+"""
+import gc
+import warnings
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryTimeWarning(UserWarning):
+    """Запросы страницы уложились в число, но не во время."""
+
+
+def get_budget(url_name, method='GET'):
+    key = url_name if method == 'GET' else f'{method} {url_name}'
+    try:
+        return settings.QUERY_BUDGETS[key]
+    except KeyError:
+        raise KeyError(f'Для {key} не задан бюджет запросов в QUERY_BUDGETS')
+
+
+@contextmanager
+def query_budget(url_name, method='GET', using=DEFAULT_DB_ALIAS):
+    """
+    Проверяет, что код внутри блока укладывается в бюджет страницы.
+
+    При превышении бросает AssertionError (для времени - выдаёт
+    предупреждение) со списком выполненных запросов, чтобы сразу
+    было видно, какой из них лишний. Сборщик мусора на время замера
+    отключается, как в timeit: его пауза посреди запроса иначе
+    засчитывается во время БД.
+    """
+    budget = get_budget(url_name, method)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    queries = context.captured_queries
+    time_ms = sum(float(query['time']) for query in queries) * 1000
+    if (
+        len(queries) <= budget['queries']
+        and time_ms <= budget['time_ms']
+    ):
+        return
+    sql = '\n'.join(
+        f'{index}. [{float(query["time"]) * 1000:.1f} мс] {query["sql"]}'
+        for index, query in enumerate(queries, start=1)
+    )
+    report = (
+        f'{method} {url_name}: {len(queries)} запросов за {time_ms:.1f} мс '
+        f'при бюджете {budget["queries"]} запросов '
+        f'и {budget["time_ms"]} мс:\n{sql}'
+    )
+    if len(queries) > budget['queries'] or settings.QUERY_BUDGET_STRICT_TIME:
+        raise AssertionError(report)
+    warnings.warn(report, QueryTimeWarning)
+
+
+class QueryBudgetMixin:
+    """Примесь для TestCase: self.query_budget(url_name, method)."""
+
+    def query_budget(self, url_name, method='GET', using=DEFAULT_DB_ALIAS):
+        return query_budget(url_name, method, using)
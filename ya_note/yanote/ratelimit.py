@@ -0,0 +1,94 @@
+"""
+Ограничение частоты изменяющих запросов.
+
+Лимиты задаются по имени URL в RATE_LIMITS: не больше requests
+запросов за period секунд на пользователя, а для анонимов - на IP.
+Счётчик окна живёт в кеше и увеличивается одной операцией cache.incr;
+запросов к БД проверка не делает. incr атомарен только в memcached и
+в кеше памяти процесса, поэтому с другим кешем непустые RATE_LIMITS
+не дают запустить сервер.
+"""
+import math
+import time
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+RATE_LIMIT_KEY = 'ratelimit:{name}:{client}:{window}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# Кеши с атомарным incr. Счётчики кеша в памяти общие только для
+# потоков одного процесса: он годится для тестов и runserver.
+ATOMIC_INCR_CACHES = (BaseMemcachedCache, LocMemCache)
+
+
+def hit(key, period):
+    """
+    Увеличивает счётчик окна и возвращает его значение.
+
+    Обычно это один incr; только первый запрос окна заводит
+    счётчик через add.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, period):
+            return 1
+        return cache.incr(key)
+
+
+def client_id(request):
+    """
+    Пользователь или, для анонимов, IP.
+
+    Пользователя сессии к этому моменту всё равно загружает
+    представление, так что проверка не добавляет запросов к БД.
+    """
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR")}'
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Отвечает 429 с Retry-After, когда клиент исчерпал лимит URL."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if settings.RATE_LIMITS and not isinstance(
+            caches[DEFAULT_CACHE_ALIAS], ATOMIC_INCR_CACHES
+        ):
+            raise ImproperlyConfigured(
+                'Счётчикам RATE_LIMITS нужен атомарный incr: задайте '
+                'CACHE_PROFILE=memcached или оставьте RATE_LIMITS пустым.'
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        name = request.resolver_match.view_name
+        limit = settings.RATE_LIMITS.get(name)
+        if limit is None:
+            return None
+        now = time.time()
+        window = int(now // limit['period'])
+        requests = hit(
+            RATE_LIMIT_KEY.format(
+                name=name, client=client_id(request), window=window
+            ),
+            limit['period'],
+        )
+        if requests <= limit['requests']:
+            return None
+        response = HttpResponse(
+            'Слишком много запросов, попробуйте позже.',
+            status=HTTPStatus.TOO_MANY_REQUESTS,
+        )
+        response['Retry-After'] = math.ceil(
+            (window + 1) * limit['period'] - now
+        )
+        return response
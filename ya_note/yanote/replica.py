@@ -0,0 +1,99 @@
+"""
+Чтение с реплики, запись в основную БД.
+
+Роутер и middleware включаются, когда задан путь к реплике
+DATABASE_REPLICA (см. настройки). Реплика отстаёт от основной БД,
+поэтому клиент, который что-то изменил, ещё REPLICA_STICKY_SECONDS
+читает из основной БД и видит свои изменения.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+REPLICA_DB_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# Сессия, которой ещё нет в реплике, считается пустой, и
+# SessionMiddleware удаляет cookie: пользователь был бы разлогинен.
+PRIMARY_APPS = {'sessions'}
+
+_use_primary = ContextVar('use_primary', default=False)
+
+
+def pin_primary(pinned=True):
+    """Направляет чтения текущего контекста в основную БД или обратно."""
+    previous = _use_primary.get()
+    _use_primary.set(pinned)
+    return previous
+
+
+def primary_pinned():
+    """Закреплены ли чтения текущего контекста за основной БД."""
+    return _use_primary.get()
+
+
+@contextmanager
+def primary():
+    previous = pin_primary()
+    try:
+        yield
+    finally:
+        pin_primary(previous)
+
+
+class ReplicaRouter:
+    """
+    Чтения идут в реплику, всё остальное - в основную БД.
+
+    Чтения внутри транзакции основной БД остаются в ней: там их
+    результат может зависеть от ещё не зафиксированных изменений.
+    Реплика получает данные только копированием (sync_replica),
+    поэтому миграции к ней не применяются.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _use_primary.get()
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware(MiddlewareMixin):
+    """
+    Закрепляет клиента за основной БД после изменяющего запроса.
+
+    Сам изменяющий запрос читает из основной БД, а ответ ставит
+    cookie REPLICA_STICKY_COOKIE на REPLICA_STICKY_SECONDS: пока она
+    есть, чтения клиента тоже идут в основную БД. MiddlewareMixin
+    работает и под ASGI, не переводя цепочку в синхронный режим.
+    """
+
+    def process_request(self, request):
+        request.previous_primary = pin_primary(
+            request.method not in SAFE_METHODS
+            or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        )
+
+    def process_response(self, request, response):
+        pin_primary(request.previous_primary)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response